@@ -0,0 +1,140 @@
+# Async views for ASGI deployments of Family Bookkeeping
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .authentication import ClaimsJWTAuthentication
+from .email_service import EmailService
+from .endpoints import (
+    family_report_email, family_report_expenses, family_report_member, monthly_summary_data, monthly_summary_emails,
+    queued_email_data, self_member_data, statistics_request, tax_report_year, test_email_address, test_email_data,
+    welcome_email
+)
+from .family import aget_family
+from .ledger import arange_statistics, member_rollup, rollup_statistics
+from .outbox import aenqueue_emails
+from .renderers import ORJSONRenderer
+from .reports import acached_tax_report
+from .response_cache import family_cached
+from .versions import data_versioned
+
+# Thread pool of send_email(), created on first use
+_email_executor = None
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    return json_response(detail, exc.status_code)
+
+
+def parse_body(request):
+    """The request body parsed like @api_view does, by DRF's parsers (JSON, form and multipart by default)"""
+    return Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]).data
+
+
+def async_api_view(methods):
+    """
+    Async counterpart of @api_view + IsAuthenticated for plain Django views.
+
+    Authenticates the bearer token with ClaimsJWTAuthentication (no user
+    query for tokens with claims), parses bodies into request.data and
+    answers APIExceptions (including the RequestErrors of api/endpoints.py)
+    in DRF's shapes.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+            try:
+                authenticated = await ClaimsJWTAuthentication().aauthenticate(request)
+                if authenticated is None:
+                    return json_response(
+                        {'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED
+                    )
+                request.user = authenticated[0]
+                request.data = parse_body(request) if request.method == 'POST' else {}
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc)
+
+        # Bearer tokens are not sent automatically by browsers, so CSRF does not apply
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def send_email(method, *args):
+    """Run a blocking EmailService call in a worker thread, so the event loop keeps serving"""
+    global _email_executor
+    if _email_executor is None:
+        _email_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_EMAIL_THREADS, thread_name_prefix='email')
+    return await sync_to_async(method, thread_sensitive=False, executor=_email_executor)(*args)
+
+
+@async_api_view(['GET'])
+@data_versioned
+@family_cached
+async def statistics(request):
+    """Get statistics for a family member"""
+    family_member, ledger_range = statistics_request(request.GET, await aget_family(request))
+    if ledger_range:
+        return json_response(await arange_statistics(family_member, ledger_range))
+    return json_response(rollup_statistics(member_rollup(family_member)))
+
+
+@async_api_view(['GET'])
+async def tax_report(request):
+    """Generate AI-powered tax report for the year"""
+    return json_response(await acached_tax_report(request.user.id, tax_report_year(request.GET)))
+
+
+@async_api_view(['GET'])
+async def get_user_family_member(request):
+    """Get the current user's family member profile"""
+    return json_response(self_member_data(await aget_family(request)))
+
+
+@async_api_view(['POST'])
+async def send_family_report(request):
+    """Send a report to a family member via email"""
+    family_member = family_report_member(request.data, await aget_family(request))
+    expenses = [expense async for expense in family_report_expenses(family_member)]
+    emails = await aenqueue_emails(
+        [family_report_email(request.data, family_member, expenses)], 'family_report', request.user
+    )
+    return json_response(queued_email_data('Report queued for sending', emails[0]), status.HTTP_202_ACCEPTED)
+
+
+@async_api_view(['POST'])
+async def send_welcome_email(request):
+    """Send welcome email to a new family member"""
+    emails = await aenqueue_emails([welcome_email(request.data)], 'welcome', request.user)
+    return json_response(queued_email_data('Welcome email queued for sending', emails[0]), status.HTTP_202_ACCEPTED)
+
+
+@async_api_view(['POST'])
+async def send_monthly_summary(request):
+    """Send monthly summary to family members"""
+    recipients, messages = monthly_summary_emails(request.data, await aget_family(request))
+    emails = await aenqueue_emails(messages, 'monthly_summary', request.user)
+    return json_response(monthly_summary_data(recipients, emails), status.HTTP_202_ACCEPTED)
+
+
+@async_api_view(['POST'])
+async def test_email(request):
+    """Test email functionality (sent right away, to check the mail server settings)"""
+    test_email = test_email_address(request.data)
+    success, message = await send_email(EmailService.send_welcome_email, test_email, "Test User")
+    return json_response(test_email_data(test_email, success, message))
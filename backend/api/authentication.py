@@ -0,0 +1,145 @@
+# JWT authentication for Family Bookkeeping
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import ClaimsUser
+
+# user id -> (is_active, checked at) of recently seen users, per process
+_active_users = {}
+_active_users_lock = threading.Lock()
+
+
+def stamp_user_claims(token, user):
+    """Copy the fields ClaimsJWTAuthentication builds request.user from into the token"""
+    token['username'] = user.username
+    token['is_active'] = user.is_active
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
+
+
+def tokens_for_user(user):
+    """Refresh token for the user carrying the claims ClaimsJWTAuthentication builds users from"""
+    # Access tokens copy these from the refresh token
+    return stamp_user_claims(RefreshToken.for_user(user), user)
+
+
+def access_token_for(refresh):
+    """
+    New access token from a refresh token, with the user's current claims.
+
+    Refresh tokens live for days, so staff and superuser changes since
+    login are read from the database. Raises User.DoesNotExist for deleted
+    or deactivated users.
+    """
+    user = User.objects.get(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True)
+    return stamp_user_claims(refresh.access_token, user)
+
+
+def _cached_active(user_id):
+    cached = _active_users.get(user_id)
+    if cached is not None and time.monotonic() - cached[1] < settings.JWT_USER_CACHE_TTL:
+        return cached[0]
+    return None
+
+
+def _remember_active(user_id, active):
+    with _active_users_lock:
+        _active_users[user_id] = (active, time.monotonic())
+    return active
+
+
+def is_user_active(user_id):
+    """Whether the user still exists and is active, checked at most every JWT_USER_CACHE_TTL seconds"""
+    active = _cached_active(user_id)
+    if active is None:
+        active = _remember_active(user_id, User.objects.filter(pk=user_id, is_active=True).exists())
+    return active
+
+
+async def ais_user_active(user_id):
+    """Async is_user_active()"""
+    active = _cached_active(user_id)
+    if active is None:
+        active = _remember_active(user_id, await User.objects.filter(pk=user_id, is_active=True).aexists())
+    return active
+
+
+def forget_user(user_id):
+    """Drop the cached active flag of a user, e.g. after it was deactivated or deleted"""
+    with _active_users_lock:
+        _active_users.pop(user_id, None)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from the token claims.
+
+    Access tokens issued by tokens_for_user() carry the user's id, username,
+    active, staff and superuser flags, so request.user is an in-memory
+    ClaimsUser with just those fields (which refuses save()) instead of a
+    row loaded on every request. Whether the user was
+    deactivated or deleted since the token was issued is checked against a
+    per-process cache that expires after JWT_USER_CACHE_TTL seconds.
+
+    Tokens without the claims (issued before them), JWT_STATELESS_USER =
+    False and CHECK_REVOKE_TOKEN (which needs the password hash) use the
+    regular database lookup. Views that need other user fields must load
+    the user themselves.
+    """
+
+    def get_user(self, validated_token):
+        if not self.is_stateless(validated_token):
+            return super().get_user(validated_token)
+        if not is_user_active(validated_token[api_settings.USER_ID_CLAIM]):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return self.user_from_claims(validated_token)
+
+    async def aauthenticate(self, request):
+        """Async authenticate() for plain async Django views"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if not self.is_stateless(validated_token):
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+        if not await ais_user_active(validated_token[api_settings.USER_ID_CLAIM]):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return self.user_from_claims(validated_token), validated_token
+
+    def is_stateless(self, validated_token):
+        """Whether request.user can be built from this token's claims"""
+        return (
+            settings.JWT_STATELESS_USER
+            and not api_settings.CHECK_REVOKE_TOKEN
+            and 'username' in validated_token
+            and 'is_staff' in validated_token
+            and api_settings.USER_ID_CLAIM in validated_token
+        )
+
+    def user_from_claims(self, validated_token):
+        if not validated_token.get('is_active', True):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        user = ClaimsUser(
+            id=validated_token[api_settings.USER_ID_CLAIM],
+            username=validated_token['username'],
+            is_active=True,
+            is_staff=validated_token['is_staff'],
+            is_superuser=validated_token.get('is_superuser', False),
+        )
+        # Behave as a row loaded from the database in queries and relations
+        user._state.adding = False
+        user._state.db = router.db_for_read(User)
+        return user
@@ -0,0 +1,192 @@
+# Batched ledger writes for Family Bookkeeping
+from collections import defaultdict
+from django.db import router, transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from rest_framework import serializers
+from .categorization import get_categorizer
+from .ledger import LedgerChanges, tracked_ledger_writes
+from .models import Expense, Mile, Hour
+from .serializers import ExpenseSerializer, MileSerializer, HourSerializer
+
+# Most operations accepted in one request
+BATCH_MAX_OPERATIONS = 500
+
+BATCH_OPS = ('create', 'update', 'delete')
+
+
+def _batch_serializer(serializer_class):
+    """The ledger serializer with family_member resolved by the batch instead of one query per item"""
+    return type(f'Batch{serializer_class.__name__}', (serializer_class,), {
+        'family_member': serializers.PrimaryKeyRelatedField(read_only=True),
+    })
+
+
+# Value of the kind field -> (model, serializer)
+BATCH_KINDS = {
+    'expense': (Expense, _batch_serializer(ExpenseSerializer)),
+    'mile': (Mile, _batch_serializer(MileSerializer)),
+    'hour': (Hour, _batch_serializer(HourSerializer)),
+}
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_ledger_batch(family, operations):
+    """
+    Apply a list of expense/mile/hour create, update and delete operations.
+
+    Each operation is {'op', 'kind', 'id' (update/delete), 'data'
+    (create/update)}. Family members come from the request's Family, the
+    referenced rows are loaded and locked with one query per kind, and the
+    operations are written with bulk_create, bulk_update and one delete per
+    kind in a single transaction together with their ledger side effects.
+    If any operation is invalid nothing is written: it reports its errors
+    and the others are 'skipped'. Returns one result per operation, in order.
+    """
+    user = family.user
+    results = [None] * len(operations)
+
+    def fail(index, error):
+        results[index] = {'index': index, 'status': 'error', 'errors': error}
+
+    with transaction.atomic(), tracked_ledger_writes():
+        # Resolve every referenced row up front, locked like LedgerWriteMixin.lock_row
+        row_ids = defaultdict(set)
+        for operation in operations:
+            if isinstance(operation, dict) and operation.get('kind') in BATCH_KINDS and _parse_id(operation.get('id')) is not None:
+                row_ids[operation['kind']].add(_parse_id(operation['id']))
+
+        rows = {
+            kind: BATCH_KINDS[kind][0].objects.filter(
+                id__in=list(ids), family_member__user=user
+            ).select_related('family_member').select_for_update(of=('self',)).in_bulk()
+            for kind, ids in row_ids.items()
+        }
+
+        creates = defaultdict(list)
+        updates = defaultdict(list)
+        deletes = defaultdict(list)
+        targeted = set()
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                fail(index, 'Operation must be an object')
+                continue
+            op = operation.get('op')
+            kind = operation.get('kind')
+            if op not in BATCH_OPS:
+                fail(index, f"Unknown op '{op}'")
+                continue
+            if kind not in BATCH_KINDS:
+                fail(index, f"Unknown kind '{kind}'")
+                continue
+            model, serializer_class = BATCH_KINDS[kind]
+            data = operation.get('data') or {}
+            if not isinstance(data, dict):
+                fail(index, 'data must be an object')
+                continue
+
+            entry = None
+            if op != 'create':
+                entry = rows.get(kind, {}).get(_parse_id(operation.get('id')))
+                if entry is None:
+                    fail(index, f'{kind.capitalize()} not found')
+                    continue
+                if (kind, entry.pk) in targeted:
+                    fail(index, f'{kind.capitalize()} {entry.pk} is already changed by this batch')
+                    continue
+                targeted.add((kind, entry.pk))
+
+            if op == 'delete':
+                deletes[kind].append((index, entry))
+                continue
+
+            member = None
+            if 'family_member' in data or op == 'create':
+                member = family.get_member(data.get('family_member'))
+                if member is None:
+                    fail(index, 'Family member not found')
+                    continue
+
+            serializer = serializer_class(entry, data=data, partial=(op == 'update'))
+            if not serializer.is_valid():
+                fail(index, serializer.errors)
+                continue
+            if op == 'create':
+                creates[kind].append((index, model(family_member=member, **serializer.validated_data)))
+            else:
+                updates[kind].append((index, entry, member, serializer.validated_data))
+
+        if any(results):
+            # One invalid operation rejects the whole batch
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = {'index': index, 'status': 'skipped'}
+            return results
+
+        changes = LedgerChanges()
+        if deletes:
+            # One DELETE per kind, with post_delete (cache invalidation) sent for the loaded rows
+            collector = Collector(using=router.db_for_write(Expense))
+            for kind, items in deletes.items():
+                for index, entry in items:
+                    changes.remove(entry)
+                    results[index] = {'index': index, 'status': 'deleted', 'id': entry.pk}
+                collector.collect([entry for _, entry in items])
+            collector.delete()
+
+        now = timezone.now()
+        for kind, items in updates.items():
+            model = BATCH_KINDS[kind][0]
+            fields = {'updated_at'}
+            for index, entry, member, validated_data in items:
+                changes.remove(entry)
+                for field, value in validated_data.items():
+                    setattr(entry, field, value)
+                if member is not None:
+                    entry.family_member = member
+                    fields.add('family_member')
+                entry.updated_at = now
+                fields.update(validated_data)
+            entries = [entry for _, entry, _, _ in items]
+            if model is Expense:
+                _categorize(entries)
+                fields.update(['tax_category', 'tax_deductible', 'tax_confidence', 'suggested_form'])
+            model.objects.bulk_update(entries, sorted(fields))
+            for index, entry, _, _ in items:
+                changes.add(entry)
+
+        for kind, items in creates.items():
+            model = BATCH_KINDS[kind][0]
+            entries = [entry for _, entry in items]
+            if model is Expense:
+                _categorize(entries)
+            model.objects.bulk_create(entries)
+            for entry in entries:
+                changes.add(entry)
+
+        changes.apply()
+
+    for kind, items in updates.items():
+        serializer_class = BATCH_KINDS[kind][1]
+        for index, entry, _, _ in items:
+            results[index] = {'index': index, 'status': 'updated', 'id': entry.pk, 'data': serializer_class(entry).data}
+    for kind, items in creates.items():
+        serializer_class = BATCH_KINDS[kind][1]
+        for index, entry in items:
+            results[index] = {'index': index, 'status': 'created', 'id': entry.pk, 'data': serializer_class(entry).data}
+    return results
+
+
+def _categorize(expenses):
+    """bulk_create and bulk_update skip save(), so categorize the expenses here"""
+    tax_infos = get_categorizer().categorize_many(
+        [expense.description for expense in expenses], [float(expense.amount) for expense in expenses]
+    )
+    for expense, tax_info in zip(expenses, tax_infos):
+        expense.apply_tax_info(tax_info)
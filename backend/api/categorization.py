@@ -0,0 +1,90 @@
+# AI-Powered Tax Categorization for Family Bookkeeping
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+
+# Distinct descriptions remembered per process
+MATCH_CACHE_SIZE = 10000
+
+
+class TaxCategorizer:
+    """
+    Categorize expense descriptions against an ordered list of keyword rules.
+    
+    Rules are tried in file order and the first rule with a keyword anywhere
+    in the (lowercased) description wins. All keywords are compiled into one
+    regex that is scanned once per description: a lookahead at every
+    position reports the earliest-listed rule with a keyword starting there,
+    and the earliest rule over all positions is the answer.
+    """
+    
+    def __init__(self, rules, default, version=''):
+        self.rules = rules
+        self.default = default
+        self.version = version
+        alternatives = '|'.join(
+            f'(?P<r{index}>' + '|'.join(re.escape(keyword.lower()) for keyword in rule['keywords']) + ')'
+            for index, rule in enumerate(rules) if rule['keywords']
+        )
+        self.pattern = re.compile(f'(?=(?:{alternatives}))') if alternatives else None
+        self.match_rule = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match_rule)
+    
+    @classmethod
+    def from_file(cls, path):
+        content = Path(path).read_bytes()
+        data = json.loads(content)
+        return cls(data['rules'], data['default'], version=hashlib.sha1(content).hexdigest()[:12])
+    
+    def _match_rule(self, description):
+        """Index of the winning rule for a description, or None"""
+        if self.pattern is None:
+            return None
+        best = None
+        for match in self.pattern.finditer(description.lower()):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+    
+    def _result(self, rule_index, amount):
+        if rule_index is None:
+            rule = self.default
+            deductible = rule['tax_deductible']
+        else:
+            rule = self.rules[rule_index]
+            deductible = rule['tax_deductible'] and amount > rule.get('deductible_above', float('-inf'))
+        return {
+            'category': rule['category'],
+            'tax_deductible': deductible,
+            'confidence': rule['confidence'],
+            'suggested_form': rule['suggested_form']
+        }
+    
+    def categorize(self, description, amount):
+        """Tax category, deductibility, confidence and suggested form for one expense"""
+        return self._result(self.match_rule(description), amount)
+    
+    def categorize_many(self, descriptions, amounts):
+        """Categorize a column of expenses, matching each distinct description once"""
+        rule_indexes = {description: self.match_rule(description) for description in set(descriptions)}
+        return [
+            self._result(rule_indexes[description], amount)
+            for description, amount in zip(descriptions, amounts)
+        ]
+
+
+@lru_cache(maxsize=1)
+def get_categorizer():
+    """The categorizer for the configured TAX_RULES_FILE, loaded once per process"""
+    return TaxCategorizer.from_file(settings.TAX_RULES_FILE)
+
+
+def reload_rules():
+    """Forget the loaded rules so the next call reads the rules file again"""
+    get_categorizer.cache_clear()
+    return get_categorizer()
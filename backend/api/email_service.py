@@ -9,39 +9,67 @@ logger = logging.getLogger(__name__)
 
 class EmailService:
     @staticmethod
-    def send_family_report(recipient_email, recipient_name, family_member_name, report_data, report_type):
+    def build_family_report(recipient_email, recipient_name, family_member_name, report_data, report_type):
+        """Build a family bookkeeping report email, ready to send or queue"""
+        subject = f"Family Bookkeeping Report - {report_type.title()}"
+        
+        # Create HTML email content
+        html_content = EmailService._create_report_html(
+            recipient_name, family_member_name, report_data, report_type
+        )
+        
+        # Create plain text version
+        text_content = EmailService._create_report_text(
+            recipient_name, family_member_name, report_data, report_type
+        )
+        
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[recipient_email]
+        )
+        msg.attach_alternative(html_content, "text/html")
+        return msg
+    
+    @staticmethod
+    def build_welcome_email(recipient_email, recipient_name):
+        """Build the welcome email for a new family member, ready to send or queue"""
+        subject = "Welcome to Family Bookkeeping"
+        
+        html_content = f"""
+        <html>
+        <body>
+            <h2>Welcome to Family Bookkeeping!</h2>
+            <p>Dear {recipient_name},</p>
+            <p>You have been added to our family bookkeeping system. You will receive regular reports about our family's financial activities.</p>
+            <p>If you have any questions, please don't hesitate to contact us.</p>
+            <p>Best regards,<br>Family Bookkeeping System</p>
+        </body>
+        </html>
         """
-        Send a family bookkeeping report via email
+        
+        text_content = f"""
+        Welcome to Family Bookkeeping!
+        
+        Dear {recipient_name},
+        
+        You have been added to our family bookkeeping system. You will receive regular reports about our family's financial activities.
+        
+        If you have any questions, please don't hesitate to contact us.
+        
+        Best regards,
+        Family Bookkeeping System
         """
-        try:
-            subject = f"Family Bookkeeping Report - {report_type.title()}"
-            
-            # Create HTML email content
-            html_content = EmailService._create_report_html(
-                recipient_name, family_member_name, report_data, report_type
-            )
-            
-            # Create plain text version
-            text_content = EmailService._create_report_text(
-                recipient_name, family_member_name, report_data, report_type
-            )
-            
-            # Send email
-            msg = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[recipient_email]
-            )
-            msg.attach_alternative(html_content, "text/html")
-            
-            result = msg.send()
-            logger.info(f"Email sent successfully to {recipient_email}")
-            return True, "Email sent successfully"
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {recipient_email}: {str(e)}")
-            return False, str(e)
+        
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[recipient_email]
+        )
+        msg.attach_alternative(html_content, "text/html")
+        return msg
     
     @staticmethod
     def send_welcome_email(recipient_email, recipient_name):
@@ -49,41 +77,7 @@ class EmailService:
         Send welcome email to new family member
         """
         try:
-            subject = "Welcome to Family Bookkeeping"
-            
-            html_content = f"""
-            <html>
-            <body>
-                <h2>Welcome to Family Bookkeeping!</h2>
-                <p>Dear {recipient_name},</p>
-                <p>You have been added to our family bookkeeping system. You will receive regular reports about our family's financial activities.</p>
-                <p>If you have any questions, please don't hesitate to contact us.</p>
-                <p>Best regards,<br>Family Bookkeeping System</p>
-            </body>
-            </html>
-            """
-            
-            text_content = f"""
-            Welcome to Family Bookkeeping!
-            
-            Dear {recipient_name},
-            
-            You have been added to our family bookkeeping system. You will receive regular reports about our family's financial activities.
-            
-            If you have any questions, please don't hesitate to contact us.
-            
-            Best regards,
-            Family Bookkeeping System
-            """
-            
-            msg = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[recipient_email]
-            )
-            msg.attach_alternative(html_content, "text/html")
-            
+            msg = EmailService.build_welcome_email(recipient_email, recipient_name)
             result = msg.send()
             logger.info(f"Welcome email sent to {recipient_email}")
             return True, "Welcome email sent successfully"
@@ -93,68 +87,58 @@ class EmailService:
             return False, str(e)
     
     @staticmethod
-    def send_monthly_summary(recipient_email, recipient_name, family_member_name, summary_data):
-        """
-        Send monthly summary report
-        """
-        try:
-            subject = f"Monthly Family Bookkeeping Summary - {family_member_name}"
-            
-            html_content = f"""
-            <html>
-            <body>
-                <h2>Monthly Family Bookkeeping Summary</h2>
-                <p>Dear {recipient_name},</p>
-                <p>Here is the monthly summary for {family_member_name}:</p>
-                
-                <h3>Summary</h3>
-                <ul>
-                    <li><strong>Total Expenses:</strong> ${summary_data.get('total_expenses', 0):.2f}</li>
-                    <li><strong>Total Miles:</strong> {summary_data.get('total_miles', 0):.1f} miles</li>
-                    <li><strong>Total Hours:</strong> {summary_data.get('total_hours', 0):.1f} hours</li>
-                    <li><strong>Tax Deductions:</strong> ${summary_data.get('total_deductions', 0):.2f}</li>
-                </ul>
-                
-                <p>Thank you for using our family bookkeeping system!</p>
-                <p>Best regards,<br>Family Bookkeeping System</p>
-            </body>
-            </html>
-            """
-            
-            text_content = f"""
-            Monthly Family Bookkeeping Summary
-            
-            Dear {recipient_name},
-            
-            Here is the monthly summary for {family_member_name}:
-            
-            Summary:
-            - Total Expenses: ${summary_data.get('total_expenses', 0):.2f}
-            - Total Miles: {summary_data.get('total_miles', 0):.1f} miles
-            - Total Hours: {summary_data.get('total_hours', 0):.1f} hours
-            - Tax Deductions: ${summary_data.get('total_deductions', 0):.2f}
-            
-            Thank you for using our family bookkeeping system!
-            
-            Best regards,
-            Family Bookkeeping System
-            """
-            
-            msg = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[recipient_email]
-            )
-            msg.attach_alternative(html_content, "text/html")
+    def build_monthly_summary(recipient_email, recipient_name, family_member_name, summary_data):
+        """Build the monthly summary email, ready to send or queue"""
+        subject = f"Monthly Family Bookkeeping Summary - {family_member_name}"
+        
+        html_content = f"""
+        <html>
+        <body>
+            <h2>Monthly Family Bookkeeping Summary</h2>
+            <p>Dear {recipient_name},</p>
+            <p>Here is the monthly summary for {family_member_name}:</p>
             
-            result = msg.send()
-            logger.info(f"Monthly summary sent to {recipient_email}")
-            return True, "Monthly summary sent successfully"
+            <h3>Summary</h3>
+            <ul>
+                <li><strong>Total Expenses:</strong> ${summary_data.get('total_expenses', 0):.2f}</li>
+                <li><strong>Total Miles:</strong> {summary_data.get('total_miles', 0):.1f} miles</li>
+                <li><strong>Total Hours:</strong> {summary_data.get('total_hours', 0):.1f} hours</li>
+                <li><strong>Tax Deductions:</strong> ${summary_data.get('total_deductions', 0):.2f}</li>
+            </ul>
             
-        except Exception as e:
-            logger.error(f"Failed to send monthly summary to {recipient_email}: {str(e)}")
-            return False, str(e)
+            <p>Thank you for using our family bookkeeping system!</p>
+            <p>Best regards,<br>Family Bookkeeping System</p>
+        </body>
+        </html>
+        """
+        
+        text_content = f"""
+        Monthly Family Bookkeeping Summary
+        
+        Dear {recipient_name},
+        
+        Here is the monthly summary for {family_member_name}:
+        
+        Summary:
+        - Total Expenses: ${summary_data.get('total_expenses', 0):.2f}
+        - Total Miles: {summary_data.get('total_miles', 0):.1f} miles
+        - Total Hours: {summary_data.get('total_hours', 0):.1f} hours
+        - Tax Deductions: ${summary_data.get('total_deductions', 0):.2f}
+        
+        Thank you for using our family bookkeeping system!
+        
+        Best regards,
+        Family Bookkeeping System
+        """
+        
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[recipient_email]
+        )
+        msg.attach_alternative(html_content, "text/html")
+        return msg
     
     @staticmethod
     def _create_report_html(recipient_name, family_member_name, report_data, report_type):
@@ -0,0 +1,123 @@
+# Request handling shared by the sync (views.py) and async (async_views.py) views of Family Bookkeeping
+from datetime import datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .email_service import EmailService
+from .ledger import LedgerRange, member_rollup, rollup_statistics
+from .models import Expense
+from .reports import family_report_data
+from .serializers import FamilyMemberSerializer, OutboundEmailSerializer
+
+
+class RequestError(APIException):
+    """Answered as {'error': message}, the shape of the views' own error responses"""
+    status_code = status.HTTP_400_BAD_REQUEST
+
+    def __init__(self, message, status_code=None):
+        super().__init__({'error': message})
+        if status_code is not None:
+            self.status_code = status_code
+
+
+def require_member(family, family_member_id, missing_message):
+    """The family member a request names, or a RequestError"""
+    if not family_member_id:
+        raise RequestError(missing_message)
+    family_member = family.get_member(family_member_id)
+    if family_member is None:
+        raise RequestError('Family member not found', status.HTTP_404_NOT_FOUND)
+    return family_member
+
+
+def statistics_request(params, family):
+    """(family member, LedgerRange) of a statistics request; totals of an empty range come from the rollup"""
+    family_member = require_member(family, params.get('family_member_id'), 'Family member ID is required')
+    try:
+        return family_member, LedgerRange.from_params(params)
+    except ValueError as e:
+        raise RequestError(str(e))
+
+
+def tax_report_year(params):
+    try:
+        return int(params.get('year', datetime.now().year))
+    except ValueError:
+        raise RequestError('year must be a number')
+
+
+def self_member_data(family):
+    """The user's own family member profile"""
+    if family.self_member is None:
+        raise RequestError('Family member profile not found', status.HTTP_404_NOT_FOUND)
+    return FamilyMemberSerializer(family.self_member).data
+
+
+def family_report_member(data, family):
+    """Check a family report request and return the member it reports on"""
+    if not all([data.get('recipient_email'), data.get('recipient_name'), data.get('family_member_id')]):
+        raise RequestError('recipient_email, recipient_name, and family_member_id are required')
+    return require_member(family, data.get('family_member_id'), 'family_member_id is required')
+
+
+def family_report_expenses(family_member):
+    """The expenses listed in a family report"""
+    return Expense.objects.filter(family_member=family_member)[:10]
+
+
+def family_report_email(data, family_member, expenses):
+    report_data = family_report_data(rollup_statistics(member_rollup(family_member)), expenses)
+    return EmailService.build_family_report(
+        data.get('recipient_email'), data.get('recipient_name'), family_member.name, report_data,
+        data.get('report_type', 'monthly')
+    )
+
+
+def welcome_email(data):
+    recipient_email = data.get('recipient_email')
+    recipient_name = data.get('recipient_name')
+    if not all([recipient_email, recipient_name]):
+        raise RequestError('recipient_email and recipient_name are required')
+    return EmailService.build_welcome_email(recipient_email, recipient_name)
+
+
+def monthly_summary_emails(data, family):
+    """(recipients, messages): the summary of the requested member for every family member with an email address"""
+    family_member = require_member(family, data.get('family_member_id'), 'family_member_id is required')
+    recipients = [member for member in family.members if member.email]
+    if not recipients:
+        raise RequestError('No family members with email addresses found')
+
+    summary_data = rollup_statistics(member_rollup(family_member))
+    summary_data['total_deductions'] = summary_data['total_expenses'] * 0.1  # 10% deduction estimate
+    return recipients, [
+        EmailService.build_monthly_summary(member.email, member.name, family_member.name, summary_data)
+        for member in recipients
+    ]
+
+
+def queued_email_data(message, email):
+    return {'message': message, 'email': OutboundEmailSerializer(email).data}
+
+
+def monthly_summary_data(recipients, emails):
+    return {
+        'message': 'Monthly summary emails queued',
+        'results': [
+            {'name': member.name, **OutboundEmailSerializer(email).data}
+            for member, email in zip(recipients, emails)
+        ]
+    }
+
+
+def test_email_address(data):
+    test_email = data.get('test_email')
+    if not test_email:
+        raise RequestError('test_email is required')
+    return test_email
+
+
+def test_email_data(test_email, success, message):
+    """Result of EmailService.send_welcome_email() for the test email endpoint"""
+    if not success:
+        raise RequestError(f'Failed to send test email: {message}', status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return {'message': f'Test email sent to {test_email}'}
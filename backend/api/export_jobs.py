@@ -0,0 +1,96 @@
+# Background export jobs for Family Bookkeeping
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _init_worker():
+    """Set up Django in a freshly spawned export worker"""
+    import django
+    django.setup()
+
+
+def get_executor():
+    """The process pool export jobs run in, created on first use"""
+    global _executor
+    if _executor is None:
+        # Spawn rather than fork so workers never share the parent's database connections
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def run_export_job(job_id):
+    """Build (or reuse) the artifact for an export job and record the outcome"""
+    from .exports import cached_export, export_data_version
+    from .models import ExportJob
+    
+    job = ExportJob.objects.select_related('user').get(id=job_id)
+    if job.status != 'pending':
+        # Failed by expire_stale_job() while it waited in the queue
+        return
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+    try:
+        job.data_version = export_data_version(job.user_id, job.year)
+        job.file_path = str(cached_export(job.user, job.year, job.format))
+        job.status = 'done'
+    except Exception as e:
+        logger.error(f"Export job {job_id} failed: {str(e)}")
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'data_version', 'file_path', 'error', 'finished_at'])
+
+
+def expire_stale_job(job):
+    """
+    Fail a job left pending or running for EXPORT_JOB_TIMEOUT seconds.
+    
+    Nothing else finishes the job of a pool process that died or of a web
+    worker restarted before submitting it, so polls check it here.
+    """
+    from .models import ExportJob
+    
+    if job.status not in ('pending', 'running'):
+        return
+    if timezone.now() - (job.started_at or job.created_at) < timedelta(seconds=settings.EXPORT_JOB_TIMEOUT):
+        return
+    job.finished_at = timezone.now()
+    job.error = 'Export job timed out, please start a new one'
+    # Unless the worker finished it meanwhile
+    if ExportJob.objects.filter(id=job.id, status=job.status).update(
+        status='failed', error=job.error, finished_at=job.finished_at
+    ):
+        job.status = 'failed'
+    else:
+        job.refresh_from_db()
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error:
+        logger.error(f"Export worker crashed: {str(error)}")
+
+
+def submit_export_job(job):
+    """Queue a job once the transaction that created it has committed"""
+    def submit():
+        if settings.EXPORT_WORKERS <= 0:
+            # No pool configured, run in the calling thread
+            run_export_job(job.id)
+            return
+        get_executor().submit(run_export_job, job.id).add_done_callback(_log_failure)
+    transaction.on_commit(submit)
@@ -0,0 +1,184 @@
+# Transaction exports for Family Bookkeeping
+import csv
+import hashlib
+import os
+from io import BytesIO
+from itertools import islice
+from pathlib import Path
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+try:
+    import pandas as pd
+    import openpyxl
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+    pd = None
+    openpyxl = None
+
+from .categorization import get_categorizer
+from .ledger import family_ledger
+from .models import FamilyMember, LedgerEntry
+
+EXPORT_COLUMNS = [
+    'Date', 'Family Member', 'Type', 'Description', 'Amount',
+    'Tax Category', 'Tax Deductible', 'Confidence', 'Suggested Form'
+]
+
+# Rows fetched per round trip while walking the ledger tables
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the value straight back"""
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(user, year, chunk_size=EXPORT_CHUNK_SIZE, ledger_range=None):
+    """
+    Yield one tuple per transaction of the user's family in the given year
+    (every year when None) and LedgerRange, in EXPORT_COLUMNS order.
+    
+    Expenses, miles and hours are read in a single query over the ledger
+    view with a server-side cursor, so memory use does not grow with the
+    number of transactions.
+    """
+    member_names = dict(FamilyMember.objects.filter(user=user).values_list('id', 'name'))
+    kind_labels = dict(LedgerEntry.KIND_CHOICES)
+    
+    entries = family_ledger(member_names)
+    if year is not None:
+        entries = entries.filter(created_at__year=year)
+    if ledger_range is not None:
+        entries = ledger_range.filter(entries, 'quantity')
+    entries = entries.values_list(
+        'created_at', 'family_member_id', 'kind', 'description', 'quantity',
+        'tax_category', 'tax_deductible', 'tax_confidence', 'suggested_form'
+    ).order_by('family_member_id', '-created_at')
+    for created_at, member_id, kind, description, quantity, *tax_info in entries.iterator(chunk_size=chunk_size):
+        yield (
+            created_at.strftime('%Y-%m-%d'), member_names[member_id], kind_labels[kind],
+            description, float(quantity), *tax_info
+        )
+
+
+async def aiter_export_rows(user, year, chunk_size=EXPORT_CHUNK_SIZE, ledger_range=None):
+    """
+    Async iter_export_rows(), for streaming under ASGI.
+    
+    Django buffers a sync iterator of a StreamingHttpResponse served over
+    ASGI into a list before sending it. This one pulls chunk_size rows at a
+    time from the cursor in Django's sync thread instead.
+    """
+    rows = iter_export_rows(user, year, chunk_size, ledger_range)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        for row in chunk:
+            yield row
+
+
+def iter_csv(rows):
+    """Encode rows as CSV lines, header first, one line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_csv(rows):
+    """Async iter_csv() over an async iterator of rows"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+def build_csv(user, year):
+    """Render the year's transactions as CSV bytes"""
+    return ''.join(iter_csv(iter_export_rows(user, year))).encode('utf-8')
+
+
+def build_excel(user, year, ledger_range=None):
+    """Render the year's transactions, tax summary and member summary as an Excel workbook"""
+    df = pd.DataFrame(list(iter_export_rows(user, year, ledger_range=ledger_range)), columns=EXPORT_COLUMNS)
+    
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Transactions', index=False)
+        
+        # Add tax summary sheet
+        tax_summary = df.groupby(['Tax Category', 'Tax Deductible']).agg({
+            'Amount': 'sum',
+            'Confidence': 'mean'
+        }).reset_index()
+        tax_summary.to_excel(writer, sheet_name='Tax Summary', index=False)
+        
+        # Add family member summary
+        member_summary = df.groupby('Family Member').agg({
+            'Amount': 'sum',
+            'Type': 'count'
+        }).reset_index()
+        member_summary.columns = ['Family Member', 'Total Amount', 'Transaction Count']
+        member_summary.to_excel(writer, sheet_name='Family Summary', index=False)
+    
+    return output.getvalue()
+
+
+EXPORT_BUILDERS = {
+    'excel': (build_excel, 'xlsx'),
+    'csv': (build_csv, 'csv'),
+}
+
+
+def export_data_version(user_id, year):
+    """
+    Fingerprint of a family's ledger rows for one year.
+    
+    The row count catches inserts and deletes, the latest updated_at catches
+    edits (of rows and of member names) and the rules version catches
+    recategorization, so the fingerprint changes whenever the export would.
+    """
+    members = list(FamilyMember.objects.filter(user_id=user_id).values_list('id', 'updated_at'))
+    summary = family_ledger(member_id for member_id, _ in members).filter(created_at__year=year).aggregate(
+        count=Count('key'), latest=Max('updated_at')
+    )
+    parts = [
+        get_categorizer().version,
+        max((updated_at.isoformat() for _, updated_at in members), default=''),
+        str(summary['count']),
+        summary['latest'].isoformat() if summary['latest'] else ''
+    ]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def export_cache_path(user_id, year, format_type, data_version):
+    """Where the artifact for one (user, year, format, data version) is cached"""
+    extension = EXPORT_BUILDERS[format_type][1]
+    return Path(settings.EXPORT_CACHE_DIR) / f'{user_id}-{year}-{format_type}-{data_version}.{extension}'
+
+
+def write_export_artifact(user, year, format_type, data_version):
+    """Build an export and store it in the cache, replacing older versions of it"""
+    path = export_cache_path(user.id, year, format_type, data_version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    builder = EXPORT_BUILDERS[format_type][0]
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(builder(user, year))
+    os.replace(tmp_path, path)
+    
+    for stale in path.parent.glob(f'{user.id}-{year}-{format_type}-*'):
+        if stale != path and not stale.name.endswith('.tmp'):
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def cached_export(user, year, format_type):
+    """Return the path of an up to date export, building it only when the data changed"""
+    data_version = export_data_version(user.id, year)
+    path = export_cache_path(user.id, year, format_type, data_version)
+    if not path.exists():
+        path = write_export_artifact(user, year, format_type, data_version)
+    return path
@@ -0,0 +1,67 @@
+# Request-scoped family membership for Family Bookkeeping
+from .models import FamilyMember
+
+
+class Family:
+    """
+    The requesting user's family members, loaded with their rollups in one query.
+
+    Get it through get_family(request) (aget_family() in async views) so
+    every view, helper and permission check of a request shares the same
+    instance.
+    """
+
+    def __init__(self, user, members):
+        self.user = user
+        self.members = members
+        self.members_by_id = {member.id: member for member in members}
+
+    @staticmethod
+    def members_of(user):
+        return FamilyMember.objects.filter(user=user).select_related('ledger_rollup')
+
+    @classmethod
+    def load(cls, user):
+        return cls(user, list(cls.members_of(user)))
+
+    @classmethod
+    async def aload(cls, user):
+        return cls(user, [member async for member in cls.members_of(user)])
+
+    @property
+    def member_ids(self):
+        return list(self.members_by_id)
+
+    @property
+    def self_member(self):
+        """The user's own member: the 'Self' relation, otherwise the first (oldest) member"""
+        return next((member for member in self.members if member.relation == 'Self'), self.members[0] if self.members else None)
+
+    @property
+    def can_view_all(self):
+        return self.self_member is not None and self.self_member.can_view_all
+
+    def get_member(self, member_id):
+        """Return the family member with this id (int or string), or None if it is not in the family"""
+        try:
+            return self.members_by_id.get(int(member_id))
+        except (TypeError, ValueError):
+            return None
+
+
+def get_family(request):
+    """Return the Family of the request's user, loading it on first use"""
+    family = getattr(request, '_family', None)
+    if family is None or family.user != request.user:
+        family = Family.load(request.user)
+        request._family = family
+    return family
+
+
+async def aget_family(request):
+    """Async get_family()"""
+    family = getattr(request, '_family', None)
+    if family is None or family.user != request.user:
+        family = await Family.aload(request.user)
+        request._family = family
+    return family
@@ -0,0 +1,116 @@
+# Transaction imports for Family Bookkeeping
+from django.db import transaction
+from django.utils import timezone
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+    pd = None
+
+from .categorization import get_categorizer
+from .ledger import LedgerChanges
+from .models import Expense, Mile, Hour
+
+REQUIRED_COLUMNS = ['Date', 'Description', 'Amount', 'Type']
+
+# Rows per INSERT statement
+IMPORT_BATCH_SIZE = 1000
+
+# Value of the Type column -> (model, value field)
+IMPORT_TYPES = {
+    'expense': (Expense, 'amount'),
+    'mile': (Mile, 'miles'),
+    'hour': (Hour, 'hours'),
+}
+
+
+def _parse_dates(raw):
+    """Parse the Date column: strings must be YYYY-MM-DD, other values (Excel dates) are taken as is"""
+    is_string = raw.map(lambda value: isinstance(value, str))
+    from_strings = pd.to_datetime(raw.where(is_string), format='%Y-%m-%d', errors='coerce')
+    from_values = pd.to_datetime(raw.where(~is_string), errors='coerce')
+    return from_strings.where(is_string, from_values)
+
+
+def _validate(df):
+    """
+    Parse and check every column at once.
+
+    Returns the parsed columns and a Series holding the first problem of
+    each invalid row (empty for valid rows).
+    """
+    types = df['Type'].astype(str).str.strip().str.lower()
+    amounts = pd.to_numeric(df['Amount'], errors='coerce')
+    dates = _parse_dates(df['Date'])
+    descriptions = df['Description']
+
+    # Largest absolute value each type's column can hold
+    limits = pd.Series({
+        kind: 10 ** (model._meta.get_field(field).max_digits - model._meta.get_field(field).decimal_places)
+        for kind, (model, field) in IMPORT_TYPES.items()
+    })
+    max_length = Expense._meta.get_field('description').max_length
+
+    # Checks in the order they are reported, first failure wins
+    checks = [
+        (~types.isin(list(IMPORT_TYPES)), lambda i: f"unknown Type '{df.at[i, 'Type']}'"),
+        (dates.isna(), lambda i: f"invalid Date '{df.at[i, 'Date']}' (expected YYYY-MM-DD)"),
+        (amounts.isna(), lambda i: f"invalid Amount '{df.at[i, 'Amount']}'"),
+        (amounts.abs() >= types.map(limits), lambda i: f"Amount {df.at[i, 'Amount']} is too large"),
+        (descriptions.isna() | (descriptions.astype(str).str.strip() == ''), lambda i: 'Description is required'),
+        (descriptions.astype(str).str.len() > max_length, lambda i: f'Description is longer than {max_length} characters'),
+    ]
+
+    problems = pd.Series('', index=df.index, dtype=object)
+    for failed, message in checks:
+        failed = failed.fillna(True) & (problems == '')
+        for index in df.index[failed]:
+            problems.at[index] = message(index)
+
+    return types, amounts, dates, descriptions, problems
+
+
+def import_dataframe(family_member, df):
+    """
+    Import the rows of an uploaded sheet for one family member.
+
+    Rows are validated column-wise, split by type and written with batched
+    bulk_create, dated from the Date column, in a single transaction
+    together with the ledger rollups.
+    Invalid rows are skipped and reported. Returns (imported_count, errors).
+    """
+    types, amounts, dates, descriptions, problems = _validate(df)
+    valid = problems == ''
+
+    errors = [f'Row {index + 1}: {problems.at[index]}' for index in df.index[~valid]]
+
+    imported_count = 0
+    changes = LedgerChanges()
+    with transaction.atomic():
+        for kind, (model, value_field) in IMPORT_TYPES.items():
+            rows = valid & (types == kind)
+            if not rows.any():
+                continue
+            entries = [
+                model(family_member=family_member, description=str(description), **{value_field: value})
+                for description, value in zip(descriptions[rows], amounts[rows])
+            ]
+            if model is Expense:
+                # bulk_create skips save(), so categorize the whole column here
+                tax_infos = get_categorizer().categorize_many(
+                    [entry.description for entry in entries], [float(entry.amount) for entry in entries]
+                )
+                for entry, tax_info in zip(entries, tax_infos):
+                    entry.apply_tax_info(tax_info)
+            model.objects.bulk_create(entries, batch_size=IMPORT_BATCH_SIZE)
+            # created_at is auto_now_add, which bulk_create fills with now(): date the rows from the sheet afterwards
+            for entry, date in zip(entries, dates[rows].dt.to_pydatetime()):
+                entry.created_at = timezone.make_aware(date)
+            model.objects.bulk_update(entries, ['created_at'], batch_size=IMPORT_BATCH_SIZE)
+            for entry in entries:
+                changes.add(entry)
+            imported_count += len(entries)
+        changes.apply()
+
+    return imported_count, errors
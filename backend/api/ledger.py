@@ -0,0 +1,348 @@
+# Ledger bookkeeping for Family Bookkeeping
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import FamilyMember, Expense, Mile, Hour, LedgerEntry, LedgerMonthlyRollup, LedgerRollup, Tombstone
+from .versions import bump_data_versions
+
+# Rows per UPDATE when stamping sync versions
+SYNC_STAMP_BATCH_SIZE = 1000
+
+# True while LedgerChanges-managed writes run, so the model signals leave their side effects to it
+_tracked_writes = ContextVar('tracked_ledger_writes', default=False)
+
+# Ledger model -> (rollup column prefix, value field)
+LEDGER_KINDS = {
+    Expense: ('expense', 'amount'),
+    Mile: ('mile', 'miles'),
+    Hour: ('hour', 'hours'),
+}
+
+
+class LedgerChanges:
+    """
+    Collect writes to the ledger tables and apply their side effects at once.
+
+    Call add() with every row that now exists and remove() with every row
+    that no longer does (an update is a remove of the old values followed by
+    an add of the new ones), then apply() inside the same transaction as the
+    writes themselves.
+    """
+
+    def __init__(self):
+        self.rollups = defaultdict(lambda: defaultdict(int))
+        # (member id, first day of the month) -> column deltas for the monthly rollups
+        self.monthly_rollups = defaultdict(lambda: defaultdict(int))
+        # Ledger model -> {pk: entry} of the rows added and removed
+        self.added = defaultdict(dict)
+        self.removed = defaultdict(dict)
+
+    def add(self, entry):
+        self.added[type(entry)][entry.pk] = entry
+        self._track(entry, 1)
+
+    def remove(self, entry):
+        self.removed[type(entry)][entry.pk] = entry
+        self._track(entry, -1)
+
+    def _track(self, entry, sign):
+        kind, value_field = LEDGER_KINDS[type(entry)]
+        # Values may still be floats/strings on freshly created rows, round them as the database does
+        field = entry._meta.get_field(value_field)
+        value = round(field.to_python(getattr(entry, value_field)), field.decimal_places)
+        for columns in (self.rollups[entry.family_member_id],
+                        self.monthly_rollups[(entry.family_member_id, rollup_month(entry.created_at))]):
+            columns[f'{kind}_total'] += sign * value
+            columns[f'{kind}_count'] += sign
+
+    def apply(self):
+        rebuilt = set()
+        for member_id, columns in self.rollups.items():
+            changes = {column: F(column) + delta for column, delta in columns.items() if delta}
+            if not changes:
+                continue
+            rollup = LedgerRollup.objects.filter(family_member_id=member_id)
+            if rollup.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    # No rollup yet, build it from the rows (which include this write)
+                    rebuild_rollups([member_id])
+                rebuilt.add(member_id)
+            except IntegrityError:
+                # A concurrent first write created it meanwhile, without this write
+                rollup.update(**changes)
+        self.rollups.clear()
+        
+        for (member_id, month), columns in self.monthly_rollups.items():
+            changes = {column: F(column) + delta for column, delta in columns.items() if delta}
+            if not changes or member_id in rebuilt:
+                # Rebuilt members already count this write in every month
+                continue
+            monthly_rollup = LedgerMonthlyRollup.objects.filter(family_member_id=member_id, month=month)
+            if monthly_rollup.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    # First write of the month, count it from the rows (which include this write)
+                    rebuild_monthly_rollup(member_id, month)
+            except IntegrityError:
+                monthly_rollup.update(**changes)
+        self.monthly_rollups.clear()
+        
+        self._apply_versions()
+        self.added.clear()
+        self.removed.clear()
+    
+    def _apply_versions(self):
+        """Bump the family data versions, stamp added rows with them, record tombstones and drop stale tax reports"""
+        # api.reports builds on this module
+        from .reports import expense_tax_year, invalidate_tax_reports
+        
+        member_ids = set()
+        for entries in (*self.added.values(), *self.removed.values()):
+            member_ids.update(entry.family_member_id for entry in entries.values())
+        if not member_ids:
+            return
+        # Every write, even one that leaves the totals alone, changes the family's data
+        member_users = dict(FamilyMember.objects.filter(id__in=member_ids).values_list('id', 'user_id'))
+        versions = bump_data_versions(member_users.values())
+        invalidate_tax_reports(
+            (member_users[entry.family_member_id], expense_tax_year(entry))
+            for entries in (self.added[Expense], self.removed[Expense])
+            for entry in entries.values()
+        )
+        
+        for model, entries in self.added.items():
+            by_version = defaultdict(list)
+            for pk, entry in entries.items():
+                entry.sync_version = versions[member_users[entry.family_member_id]]
+                by_version[entry.sync_version].append(pk)
+            for version, pks in by_version.items():
+                for start in range(0, len(pks), SYNC_STAMP_BATCH_SIZE):
+                    model.objects.filter(pk__in=pks[start:start + SYNC_STAMP_BATCH_SIZE]).update(sync_version=version)
+        
+        # Rows removed and not added back (an update removes and re-adds) are deletions
+        Tombstone.objects.bulk_create([
+            Tombstone(
+                user_id=member_users[entry.family_member_id], kind=LEDGER_KINDS[model][0],
+                object_id=pk, sync_version=versions[member_users[entry.family_member_id]]
+            )
+            for model, entries in self.removed.items()
+            for pk, entry in entries.items()
+            if pk not in self.added[model]
+        ])
+
+
+@contextmanager
+def tracked_ledger_writes():
+    """Mark the ledger rows saved and deleted within as accounted for by a LedgerChanges"""
+    token = _tracked_writes.set(True)
+    try:
+        yield
+    finally:
+        _tracked_writes.reset(token)
+
+
+def ledger_writes_tracked():
+    return _tracked_writes.get()
+
+
+def record_untracked_write(entry, deleted=False):
+    """
+    Version side effects of a ledger row saved or deleted outside LedgerChanges (admin, shell, scripts).
+    
+    Bumps the family data version and stamps the row with it, or records
+    its tombstone, so delta sync and the version-keyed caches see the
+    write, and drops the cached tax report of an expense's year. Rollups are left alone: without the old values there is no
+    delta, rebuild_rollups() recounts them.
+    """
+    changes = LedgerChanges()
+    (changes.removed if deleted else changes.added)[type(entry)][entry.pk] = entry
+    changes._apply_versions()
+
+
+def rebuild_rollups(member_ids=None):
+    """Recompute ledger rollups from the ledger tables, for all members by default"""
+    members = FamilyMember.objects.all()
+    if member_ids is not None:
+        members = members.filter(id__in=member_ids)
+    member_ids = list(members.values_list('id', flat=True))
+
+    totals = {member_id: {} for member_id in member_ids}
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        rows = model.objects.filter(family_member_id__in=member_ids).values('family_member_id').annotate(
+            total=Sum(value_field), count=Count('id')
+        ).order_by()
+        for row in rows:
+            totals[row['family_member_id']][f'{kind}_total'] = row['total'] or 0
+            totals[row['family_member_id']][f'{kind}_count'] = row['count']
+
+    monthly = defaultdict(dict)
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        rows = model.objects.filter(family_member_id__in=member_ids).values(
+            'family_member_id', month=TruncMonth('created_at', output_field=DateField())
+        ).annotate(total=Sum(value_field), count=Count('id')).order_by()
+        for row in rows:
+            columns = monthly[(row['family_member_id'], row['month'])]
+            columns[f'{kind}_total'] = row['total'] or 0
+            columns[f'{kind}_count'] = row['count']
+
+    with transaction.atomic():
+        for member_id, columns in totals.items():
+            defaults = {f'{kind}_{column}': 0 for kind, _ in LEDGER_KINDS.values() for column in ('total', 'count')}
+            defaults.update(columns)
+            LedgerRollup.objects.update_or_create(family_member_id=member_id, defaults=defaults)
+        LedgerMonthlyRollup.objects.filter(family_member_id__in=member_ids).delete()
+        LedgerMonthlyRollup.objects.bulk_create([
+            LedgerMonthlyRollup(family_member_id=member_id, month=month, **columns)
+            for (member_id, month), columns in monthly.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def rollup_month(created_at):
+    """First day of the month (in the current time zone) a ledger row is rolled up into"""
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def month_bounds(month):
+    """Aware datetimes starting the month and the next one"""
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    return (
+        timezone.make_aware(datetime.combine(month, time.min)),
+        timezone.make_aware(datetime.combine(next_month, time.min)),
+    )
+
+
+def rebuild_monthly_rollup(member_id, month):
+    """Recompute one member's rollup for the month starting on `month` from the ledger tables"""
+    start, end = month_bounds(month)
+    columns = {}
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        row = model.objects.filter(
+            family_member_id=member_id, created_at__gte=start, created_at__lt=end
+        ).aggregate(total=Sum(value_field), count=Count('id'))
+        columns[f'{kind}_total'] = row['total'] or 0
+        columns[f'{kind}_count'] = row['count']
+    LedgerMonthlyRollup.objects.update_or_create(family_member_id=member_id, month=month, defaults=columns)
+
+
+def member_rollup(member):
+    """Return the rollup of a member fetched with select_related('ledger_rollup')"""
+    try:
+        return member.ledger_rollup
+    except LedgerRollup.DoesNotExist:
+        # Members without any ledger writes yet have no rollup row
+        return LedgerRollup(family_member=member)
+
+
+def rollup_statistics(rollup):
+    """Totals in the shape returned by the statistics endpoints"""
+    return {
+        'total_expenses': float(rollup.expense_total),
+        'total_miles': float(rollup.mile_total),
+        'total_hours': float(rollup.hour_total)
+    }
+
+
+def family_ledger(member_ids):
+    """
+    Expenses, miles and hours of the given members as one LedgerEntry queryset.
+    
+    Pass a concrete list of ids rather than a subquery: databases only push
+    the member filter down into each branch of the UNION ALL view (and so
+    onto each table's (family_member, created_at) index) for literal values.
+    """
+    return LedgerEntry.objects.filter(family_member_id__in=list(member_ids))
+
+
+class LedgerRange:
+    """
+    Date and value bounds on ledger rows, from the start, end, min and max query parameters.
+    
+    start and end are dates (YYYY-MM-DD, end included) compared with
+    created_at in the current time zone; min and max bound the row's value
+    (amount, miles or hours, both included). Both kinds of range are
+    answered from composite (family_member, ...) indexes.
+    """
+    
+    PARAMS = ('start', 'end', 'min', 'max')
+    
+    def __init__(self, start=None, end=None, minimum=None, maximum=None):
+        self.start = start
+        self.end = end
+        self.minimum = minimum
+        self.maximum = maximum
+    
+    @classmethod
+    def from_params(cls, params):
+        """Parse query parameters, raising ValueError with a client-facing message when one is malformed"""
+        values = {}
+        for name in ('start', 'end'):
+            if params.get(name):
+                try:
+                    values[name] = datetime.strptime(params[name], '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+        for name, attribute in (('min', 'minimum'), ('max', 'maximum')):
+            if params.get(name):
+                try:
+                    values[attribute] = Decimal(params[name])
+                except InvalidOperation:
+                    raise ValueError(f'{name} must be a number')
+                if not values[attribute].is_finite():
+                    raise ValueError(f'{name} must be a number')
+        ledger_range = cls(**values)
+        if ledger_range.start and ledger_range.end and ledger_range.start > ledger_range.end:
+            raise ValueError('start must not be after end')
+        return ledger_range
+    
+    @property
+    def has_dates(self):
+        return self.start is not None or self.end is not None
+    
+    def __bool__(self):
+        return any(value is not None for value in (self.start, self.end, self.minimum, self.maximum))
+    
+    def filter(self, queryset, value_field):
+        """Apply the bounds to a ledger queryset whose value column is value_field"""
+        if self.start is not None:
+            queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(self.start, time.min)))
+        if self.end is not None:
+            queryset = queryset.filter(
+                created_at__lt=timezone.make_aware(datetime.combine(self.end + timedelta(days=1), time.min))
+            )
+        if self.minimum is not None:
+            queryset = queryset.filter(**{f'{value_field}__gte': self.minimum})
+        if self.maximum is not None:
+            queryset = queryset.filter(**{f'{value_field}__lte': self.maximum})
+        return queryset
+
+
+def range_statistics(member, ledger_range):
+    """Totals in the shape of rollup_statistics() for the member's rows within ledger_range"""
+    statistics = {}
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        total = ledger_range.filter(model.objects.filter(family_member=member), value_field).aggregate(
+            total=Sum(value_field)
+        )['total']
+        statistics[f'total_{kind}s'] = float(total or 0)
+    return statistics
+
+
+async def arange_statistics(member, ledger_range):
+    """Async range_statistics()"""
+    statistics = {}
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        total = (await ledger_range.filter(model.objects.filter(family_member=member), value_field).aaggregate(
+            total=Sum(value_field)
+        ))['total']
+        statistics[f'total_{kind}s'] = float(total or 0)
+    return statistics
@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from api.models import FamilyMember, Expense
+
+# Persistent connection lifetime benchmarked when the settings open one per request
+DEFAULT_MAX_AGE = 60
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec with a database connection per request against persistent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per run')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Concurrent request threads, like gunicorn workers x threads')
+
+    def handle(self, *args, **options):
+        database = connections[DEFAULT_DB_ALIAS]
+        if database.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'Running against {database.vendor}, where connecting costs far less than on PostgreSQL; '
+                f'use the production settings and a local PostgreSQL for representative numbers'
+            ))
+        configured_max_age = database.settings_dict['CONN_MAX_AGE']
+        persistent_max_age = configured_max_age or DEFAULT_MAX_AGE
+
+        user = User.objects.create(username='benchmark-connections')
+        try:
+            member = FamilyMember.objects.create(user=user, name='Benchmark', relation='Self', can_view_all=True)
+            Expense.objects.create(family_member=member, description='Benchmark', amount=Decimal('10'))
+            token = str(AccessToken.for_user(user))
+            path = f'/api/statistics/?family_member_id={member.id}'
+            for label, max_age in (('per request', 0), (f'CONN_MAX_AGE={persistent_max_age}', persistent_max_age)):
+                database.settings_dict['CONN_MAX_AGE'] = max_age
+                rate, opened = self.run(path, token, options['requests'], options['threads'])
+                self.stdout.write(f'{label:>20}: {rate:8.0f} requests/sec, {opened} connections opened')
+        finally:
+            database.settings_dict['CONN_MAX_AGE'] = configured_max_age
+            user.delete()
+
+    def run(self, path, token, requests, threads):
+        """Serve requests through Django's WSGI handler, so connections open and close as they do in gunicorn"""
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        opened = []
+        lock = threading.Lock()
+
+        def count_connection(sender, connection, **kwargs):
+            with lock:
+                opened.append(connection)
+
+        def serve(count):
+            for _ in range(count):
+                request = factory.get(path, HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+                response = handler(request.environ, lambda status, headers: None)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{path} answered {response.status_code}')
+                # Fires request_finished, which closes the connection unless it is persistent
+                response.close()
+            connections.close_all()
+
+        connection_created.connect(count_connection)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                shares = [requests // threads + (index < requests % threads) for index in range(threads)]
+                for future in [executor.submit(serve, share) for share in shares]:
+                    future.result()
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(count_connection)
+        return requests / elapsed, len(opened)
@@ -0,0 +1,84 @@
+import random
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from api.ledger import LedgerRange
+from api.models import FamilyMember, Expense
+
+# Each family's history: members and expenses per member over three years
+MEMBERS_PER_FAMILY = 4
+EXPENSES_PER_MEMBER = 250
+
+
+class Command(BaseCommand):
+    help = 'Time start/end/min/max filtered expense lists as the table grows, to show they stay flat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 400000],
+                            help='Expense table sizes to benchmark (rows)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per query, the fastest one is reported')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        queries = [
+            ('last 30 days', {'start': (today - timedelta(days=29)).isoformat()}),
+            ('over $500', {'min': '500'}),
+            ('one quarter, $100-$200', {
+                'start': (today - timedelta(days=180)).isoformat(), 'end': (today - timedelta(days=90)).isoformat(),
+                'min': '100', 'max': '200',
+            }),
+        ]
+        self.stdout.write(f"{'rows':>8}  " + ''.join(f'{label:>30}' for label, _ in queries))
+        for size in options['sizes']:
+            # Seed throwaway rows and roll them back at the end
+            with transaction.atomic():
+                user = self.seed(size)
+                timings = []
+                for _, params in queries:
+                    ledger_range = LedgerRange.from_params(params)
+                    queryset = ledger_range.filter(
+                        Expense.objects.filter(family_member__user=user).select_related('family_member'), 'amount'
+                    ).order_by('-created_at')
+                    # What a list request runs: the count and the first page
+                    run = lambda: (queryset.count(), list(queryset[:20]))
+                    best = min(self.time(run) for _ in range(options['repeat']))
+                    timings.append(f'{best * 1000:7.2f} ms {self.index_used(queryset):>18}')
+                self.stdout.write(f'{size:>8}  ' + ''.join(f'{timing:>30}' for timing in timings))
+                transaction.set_rollback(True)
+
+    def seed(self, size):
+        """Families of MEMBERS_PER_FAMILY members until the table holds `size` expenses; returns one family's user"""
+        rng = random.Random(size)
+        start = timezone.now() - timedelta(days=3 * 365)
+        families = max(size // (MEMBERS_PER_FAMILY * EXPENSES_PER_MEMBER), 1)
+        users = User.objects.bulk_create([User(username=f'benchmark-ranges-{index}') for index in range(families)])
+        members = FamilyMember.objects.bulk_create([
+            FamilyMember(user=user, name=f'Member {index}', relation='Child')
+            for user in users for index in range(MEMBERS_PER_FAMILY)
+        ])
+        random_now = lambda: start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        with mock.patch('django.utils.timezone.now', side_effect=random_now):
+            Expense.objects.bulk_create([
+                Expense(family_member=member, description='Benchmark', amount=Decimal(rng.randint(100, 100000)) / 100)
+                for member in members for _ in range(EXPENSES_PER_MEMBER)
+            ], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return users[len(users) // 2]
+
+    def index_used(self, queryset):
+        """The expense index the plan reads, or 'full scan'"""
+        match = re.search(r'\bapi_expense_(\w+_idx)\b', queryset.explain())
+        return match.group(1) if match else 'full scan'
+
+    def time(self, run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
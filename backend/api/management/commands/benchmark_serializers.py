@@ -0,0 +1,60 @@
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+from api.models import FamilyMember, Expense
+from api.renderers import ORJSONRenderer, ORJSON_AVAILABLE
+from api.serializers import ExpenseSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the cost of listing expenses through ExpenseSerializer and through the values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Expenses to list')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per variant, the fastest one is reported')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        if not ORJSON_AVAILABLE:
+            self.stdout.write(self.style.WARNING('orjson is not installed, ORJSONRenderer falls back to json'))
+
+        # Seed throwaway rows and roll them back at the end
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-serializers')
+            members = [
+                FamilyMember.objects.create(user=user, name=f'Benchmark {index}', relation='Child')
+                for index in range(4)
+            ]
+            Expense.objects.bulk_create([
+                Expense(family_member=members[index % 4], description=f'Expense {index}', amount=Decimal('12.34'))
+                for index in range(rows)
+            ], batch_size=1000)
+            queryset = Expense.objects.filter(family_member__user=user)
+
+            fields = [field for field in ExpenseSerializer.Meta.fields if field != 'family_member_name']
+            variants = [
+                ('ModelSerializer, lazy member (N+1) + JSONRenderer',
+                 lambda: JSONRenderer().render(ExpenseSerializer(queryset.all(), many=True).data)),
+                ('ModelSerializer + select_related + JSONRenderer',
+                 lambda: JSONRenderer().render(ExpenseSerializer(queryset.select_related('family_member'), many=True).data)),
+                ('values() with member name joined + ORJSONRenderer',
+                 lambda: ORJSONRenderer().render(list(queryset.values(*fields, family_member_name=F('family_member__name'))))),
+            ]
+            for label, run in variants:
+                best = min(self.time(run) for _ in range(options['repeat']))
+                self.stdout.write(f'{label:55} {best * 1000:9.1f} ms  ({best * 1000 * 10000 / rows:.1f} ms per 10k rows)')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f'Benchmarked {rows} rows'))
+
+    def time(self, run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
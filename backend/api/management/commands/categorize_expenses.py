@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.categorization import reload_rules
+from api.models import FamilyMember, Expense
+from api.reports import expense_tax_year, invalidate_tax_reports
+from api.versions import bump_data_versions
+
+TAX_FIELDS = ['tax_category', 'tax_deductible', 'tax_confidence', 'suggested_form']
+
+
+class Command(BaseCommand):
+    help = 'Re-run tax categorization over all expenses, e.g. after the tax rules changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Expenses read and written per batch')
+
+    def handle(self, *args, **options):
+        categorizer = reload_rules()
+        batch_size = options['batch_size']
+
+        expenses = Expense.objects.only('id', 'family_member_id', 'description', 'amount', 'created_at', *TAX_FIELDS).order_by('id')
+        checked = 0
+        updated = 0
+        batch = []
+        for expense in expenses.iterator(chunk_size=batch_size):
+            batch.append(expense)
+            if len(batch) == batch_size:
+                updated += self.recategorize(categorizer, batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            updated += self.recategorize(categorizer, batch)
+            checked += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} expenses, updated {updated} (rules version {categorizer.version})')
+        )
+
+    def recategorize(self, categorizer, expenses):
+        """Categorize a batch and write back only the rows whose result changed"""
+        tax_infos = categorizer.categorize_many(
+            [expense.description for expense in expenses], [float(expense.amount) for expense in expenses]
+        )
+        changed = []
+        for expense, tax_info in zip(expenses, tax_infos):
+            before = [getattr(expense, field) for field in TAX_FIELDS]
+            expense.apply_tax_info(tax_info)
+            if before != [getattr(expense, field) for field in TAX_FIELDS]:
+                changed.append(expense)
+        if not changed:
+            return 0
+        # Changed rows must reach the clients through delta sync
+        member_users = dict(
+            FamilyMember.objects.filter(id__in={expense.family_member_id for expense in changed}).values_list('id', 'user_id')
+        )
+        with transaction.atomic():
+            versions = bump_data_versions(member_users.values())
+            for expense in changed:
+                expense.sync_version = versions[member_users[expense.family_member_id]]
+            # bulk_update leaves updated_at alone, recategorization is not an edit
+            Expense.objects.bulk_update(changed, TAX_FIELDS + ['sync_version'])
+            invalidate_tax_reports(
+                (member_users[expense.family_member_id], expense_tax_year(expense)) for expense in changed
+            )
+        return len(changed)
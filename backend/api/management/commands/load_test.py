@@ -0,0 +1,81 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.core.management.base import BaseCommand, CommandError
+
+# Seconds a single request may take before it counts as failed
+REQUEST_TIMEOUT = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare how many concurrent email requests a running sync gunicorn worker and a running uvicorn '
+        'worker can hold, over HTTP. Start both against the same database and mail server, e.g. '
+        '"gunicorn bookkeeping.wsgi -w 1 -b :8000" and "gunicorn bookkeeping.asgi -k uvicorn.workers.UvicornWorker '
+        '-w 1 -b :8001", with a slow or remote SMTP server so the send dominates each request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://127.0.0.1:8000',
+                            help='Base URL of the sync (WSGI) server')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001',
+                            help='Base URL of the ASGI server')
+        parser.add_argument('--username', required=True,
+                            help='Existing account the requests log in as')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Concurrent requests to POST /api/email/test/')
+        parser.add_argument('--test-email', default='load-test@example.com',
+                            help='Recipient of the test emails')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        if count <= 0:
+            raise CommandError('--requests must be positive')
+        failures = 0
+        for label, base_url in (('sync worker (WSGI)', options['sync_url']), ('ASGI worker', options['asgi_url'])):
+            token = self.login(base_url, options['username'], options['password'])
+            payload = {'test_email': options['test_email']}
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                results = list(executor.map(lambda _: self.send(base_url, token, payload), range(count)))
+            elapsed = time.perf_counter() - start
+            failed = sum(status != 200 for status, _ in results)
+            latencies = sorted(latency for _, latency in results)
+            self.stdout.write(
+                f'{label:20} {count} requests in {elapsed:6.2f} s  {count / elapsed:7.1f} req/s  '
+                f'median {statistics.median(latencies):5.2f} s  '
+                f'p95 {latencies[min(int(count * 0.95), count - 1)]:5.2f} s  {failed} failed'
+            )
+            failures += failed
+        if failures:
+            raise CommandError(f'{failures} requests did not answer 200, check the servers\' logs')
+
+    def post(self, url, payload, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        request = Request(url, data=json.dumps(payload).encode(), headers=headers, method='POST')
+        with urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return response.status, response.read()
+
+    def login(self, base_url, username, password):
+        try:
+            _, body = self.post(f'{base_url}/api/auth/login/', {'username': username, 'password': password})
+        except (HTTPError, URLError) as e:
+            raise CommandError(f'Could not log in at {base_url}: {e}')
+        return json.loads(body)['tokens']['access']
+
+    def send(self, base_url, token, payload):
+        """(status, seconds) of one test email request; status is None when the server could not be reached"""
+        start = time.perf_counter()
+        try:
+            status, _ = self.post(f'{base_url}/api/email/test/', payload, token)
+        except HTTPError as e:
+            status = e.code
+        except (URLError, OSError):
+            status = None
+        return status, time.perf_counter() - start
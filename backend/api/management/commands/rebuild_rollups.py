@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.ledger import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-member ledger rollups (totals and monthly) from the expense, mile and hour tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--member', type=int, action='append', dest='members',
+                            help='Only rebuild this family member (can be repeated)')
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(options['members'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt ledger rollups for {count} family members')
+        )
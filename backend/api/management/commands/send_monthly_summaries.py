@@ -0,0 +1,62 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.email_service import EmailService
+from api.models import FamilyMember, OutboundEmail
+from api.outbox import outbound_email
+from api.reports import monthly_family_totals
+
+# Outbox rows per INSERT
+ENQUEUE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Queue every family's monthly summary for the members who receive reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to summarize as YYYY-MM (default: last month)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Compute the summaries without queuing them')
+
+    def handle(self, *args, **options):
+        start, end = self.month_range(options['month'])
+        month_label = start.strftime('%B %Y')
+        # Kind shared by the month's summaries, so a re-run skips the ones already queued
+        kind = f"month_end_{start.strftime('%Y-%m')}"
+
+        recipients = FamilyMember.objects.filter(send_reports=True, email__gt='')
+        already_queued = set(OutboundEmail.objects.filter(kind=kind).values_list('user_id', 'to_email'))
+        totals = monthly_family_totals(start, end, recipients.values('user_id'))
+
+        emails = []
+        families = set()
+        for user_id, name, email in recipients.values_list('user_id', 'name', 'email').order_by('user_id', 'id'):
+            if (user_id, email) in already_queued:
+                continue
+            families.add(user_id)
+            message = EmailService.build_monthly_summary(email, name, f'your family ({month_label})', totals[user_id])
+            for outbox_row in outbound_email(message, kind):
+                outbox_row.user_id = user_id
+                emails.append(outbox_row)
+
+        if not options['dry_run']:
+            OutboundEmail.objects.bulk_create(emails, batch_size=ENQUEUE_BATCH_SIZE)
+
+        action = 'Would queue' if options['dry_run'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {len(emails)} summaries for {month_label} to {len(families)} families '
+            f'({len(already_queued)} already queued)'
+        ))
+
+    def month_range(self, month):
+        if month:
+            try:
+                start = datetime.strptime(month, '%Y-%m')
+            except ValueError:
+                raise CommandError('--month must look like YYYY-MM')
+        else:
+            first_of_month = timezone.localdate().replace(day=1)
+            start = datetime(first_of_month.year, first_of_month.month, 1)
+            start = datetime(start.year - 1, 12, 1) if start.month == 1 else start.replace(month=start.month - 1)
+        end = datetime(start.year + 1, 1, 1) if start.month == 12 else start.replace(month=start.month + 1)
+        return timezone.make_aware(start), timezone.make_aware(end)
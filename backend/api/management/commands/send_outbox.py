@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from api.outbox import send_outbox_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox in batches over one mail server connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                            help='Emails claimed per batch')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait for new emails once the outbox is drained')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the emails that are due and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = self.drain(options['batch_size'])
+            if any(totals.values()):
+                self.stdout.write(
+                    f"Sent {totals['sent']}, retrying {totals['retry']}, failed {totals['failed']}"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """Send batches until none is due, reusing one connection for all of them"""
+        totals = {'sent': 0, 'retry': 0, 'failed': 0}
+        connection = get_connection(fail_silently=False)
+        try:
+            while True:
+                counts = send_outbox_batch(batch_size, connection)
+                for outcome, count in counts.items():
+                    totals[outcome] += count
+                if sum(counts.values()) < batch_size:
+                    return totals
+        finally:
+            connection.close()
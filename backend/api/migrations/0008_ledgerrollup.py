@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    FamilyMember = apps.get_model('api', 'FamilyMember')
+    LedgerRollup = apps.get_model('api', 'LedgerRollup')
+    ledgers = [
+        (apps.get_model('api', 'Expense'), 'expense', 'amount'),
+        (apps.get_model('api', 'Mile'), 'mile', 'miles'),
+        (apps.get_model('api', 'Hour'), 'hour', 'hours'),
+    ]
+    rollups = {member_id: LedgerRollup(family_member_id=member_id) for member_id in FamilyMember.objects.values_list('id', flat=True)}
+    for model, kind, value_field in ledgers:
+        rows = model.objects.values('family_member_id').annotate(
+            total=models.Sum(value_field), count=models.Count('id')
+        ).order_by()
+        for row in rows:
+            setattr(rollups[row['family_member_id']], f'{kind}_total', row['total'] or 0)
+            setattr(rollups[row['family_member_id']], f'{kind}_count', row['count'])
+    LedgerRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_alter_familymember_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('mile_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('mile_count', models.PositiveIntegerField(default=0)),
+                ('hour_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('hour_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('family_member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_rollup', to='api.familymember')),
+            ],
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+
+def categorize_existing(apps, schema_editor):
+    from api.categorization import get_categorizer
+    Expense = apps.get_model('api', 'Expense')
+    categorizer = get_categorizer()
+    expenses = list(Expense.objects.only('id', 'description', 'amount'))
+    tax_infos = categorizer.categorize_many(
+        [expense.description for expense in expenses], [float(expense.amount) for expense in expenses]
+    )
+    for expense, tax_info in zip(expenses, tax_infos):
+        expense.tax_category = tax_info['category']
+        expense.tax_deductible = tax_info['tax_deductible']
+        expense.tax_confidence = tax_info['confidence']
+        expense.suggested_form = tax_info['suggested_form']
+    Expense.objects.bulk_update(
+        expenses, ['tax_category', 'tax_deductible', 'tax_confidence', 'suggested_form'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='suggested_form',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='tax_category',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='tax_confidence',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='tax_deductible',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(categorize_existing, migrations.RunPython.noop),
+    ]
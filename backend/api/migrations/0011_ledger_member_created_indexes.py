@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_expense_tax_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['family_member', 'created_at'], name='api_expense_member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hour',
+            index=models.Index(fields=['family_member', 'created_at'], name='api_hour_member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mile',
+            index=models.Index(fields=['family_member', 'created_at'], name='api_mile_member_created_idx'),
+        ),
+    ]
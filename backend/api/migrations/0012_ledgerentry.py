@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:03
+
+from django.db import migrations, models
+
+# Miles and hours carry the fixed tax treatment the exports have always used
+CREATE_LEDGER_VIEW = """
+CREATE VIEW api_ledger_entry AS
+SELECT 'expense-' || id AS key, 'expense' AS kind, id AS entry_id, family_member_id, description,
+       amount AS quantity, tax_category, tax_deductible, tax_confidence, suggested_form,
+       created_at, updated_at
+FROM api_expense
+UNION ALL
+SELECT 'mile-' || id, 'mile', id, family_member_id, description,
+       miles, 'Business Mileage', (1 = 1), 0.90, 'Schedule C',
+       created_at, updated_at
+FROM api_mile
+UNION ALL
+SELECT 'hour-' || id, 'hour', id, family_member_id, description,
+       hours, 'Work Hours', (1 = 0), 0.70, 'Not applicable',
+       created_at, updated_at
+FROM api_hour
+"""
+
+DROP_LEDGER_VIEW = "DROP VIEW IF EXISTS api_ledger_entry"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_ledger_member_created_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_LEDGER_VIEW, DROP_LEDGER_VIEW),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('expense', 'Expense'), ('mile', 'Mile'), ('hour', 'Hour')], max_length=10)),
+                ('entry_id', models.BigIntegerField()),
+                ('description', models.CharField(max_length=200)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_category', models.CharField(max_length=50)),
+                ('tax_deductible', models.BooleanField()),
+                ('tax_confidence', models.FloatField()),
+                ('suggested_form', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'api_ledger_entry',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:08
+
+from importlib import import_module
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+ledger_view = import_module('api.migrations.0012_ledgerentry')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0013_familydataversion'),
+    ]
+
+    operations = [
+        # SQLite rebuilds the ledger tables to add columns, which fails while a view references them
+        migrations.RunSQL(ledger_view.DROP_LEDGER_VIEW, ledger_view.CREATE_LEDGER_VIEW),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('family_member', 'Family member'), ('expense', 'Expense'), ('mile', 'Mile'), ('hour', 'Hour')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('sync_version', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='familymember',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hour',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mile',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['family_member', 'sync_version'], name='api_expense_member_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familymember',
+            index=models.Index(fields=['user', 'sync_version'], name='api_member_user_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hour',
+            index=models.Index(fields=['family_member', 'sync_version'], name='api_hour_member_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mile',
+            index=models.Index(fields=['family_member', 'sync_version'], name='api_mile_member_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'sync_version'], name='api_tombstone_user_sync_idx'),
+        ),
+        migrations.RunSQL(ledger_view.CREATE_LEDGER_VIEW, ledger_view.DROP_LEDGER_VIEW),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncMonth
+
+
+def build_monthly_rollups(apps, schema_editor):
+    LedgerMonthlyRollup = apps.get_model('api', 'LedgerMonthlyRollup')
+    ledgers = [
+        (apps.get_model('api', 'Expense'), 'expense', 'amount'),
+        (apps.get_model('api', 'Mile'), 'mile', 'miles'),
+        (apps.get_model('api', 'Hour'), 'hour', 'hours'),
+    ]
+    rollups = {}
+    for model, kind, value_field in ledgers:
+        rows = model.objects.values(
+            'family_member_id', month=TruncMonth('created_at', output_field=models.DateField())
+        ).annotate(total=models.Sum(value_field), count=models.Count('id')).order_by()
+        for row in rows:
+            key = (row['family_member_id'], row['month'])
+            if key not in rollups:
+                rollups[key] = LedgerMonthlyRollup(family_member_id=row['family_member_id'], month=row['month'])
+            setattr(rollups[key], f'{kind}_total', row['total'] or 0)
+            setattr(rollups[key], f'{kind}_count', row['count'])
+    LedgerMonthlyRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('mile_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('mile_count', models.PositiveIntegerField(default=0)),
+                ('hour_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('hour_count', models.PositiveIntegerField(default=0)),
+                ('family_member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='api.familymember')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ledgermonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('family_member', 'month'), name='api_monthly_rollup_member_month_uniq'),
+        ),
+        migrations.RunPython(build_monthly_rollups, migrations.RunPython.noop),
+    ]
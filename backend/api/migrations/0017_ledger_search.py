@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:30
+
+from django.db import migrations
+
+# Ledger table -> (kind, rowid offset). Search rows are keyed rowid = id * 3 + offset so each table's ids stay apart.
+SEARCHED_TABLES = {
+    'api_expense': ('expense', 0),
+    'api_mile': ('mile', 1),
+    'api_hour': ('hour', 2),
+}
+
+# SQLite: one FTS5 index over every description, kept in step by triggers
+CREATE_SQLITE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE api_ledger_search USING fts5(
+        description, kind UNINDEXED, entry_id UNINDEXED, family_member_id UNINDEXED
+    )
+    """,
+]
+DROP_SQLITE_SEARCH = ["DROP TABLE IF EXISTS api_ledger_search"]
+
+# Triggers are dropped with their table when SQLite rebuilds it (most field changes),
+# api.search.restore_search_triggers() puts them back after every migrate
+CREATE_SQLITE_SEARCH_TRIGGERS = []
+DROP_SQLITE_SEARCH_TRIGGERS = []
+for table, (kind, offset) in SEARCHED_TABLES.items():
+    CREATE_SQLITE_SEARCH_TRIGGERS += [
+        f"""
+        CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO api_ledger_search (rowid, description, kind, entry_id, family_member_id)
+            VALUES (new.id * 3 + {offset}, new.description, '{kind}', new.id, new.family_member_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_search_update AFTER UPDATE OF description, family_member_id ON {table} BEGIN
+            UPDATE api_ledger_search SET description = new.description, family_member_id = new.family_member_id
+            WHERE rowid = old.id * 3 + {offset};
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM api_ledger_search WHERE rowid = old.id * 3 + {offset};
+        END
+        """,
+    ]
+    DROP_SQLITE_SEARCH_TRIGGERS += [
+        f"DROP TRIGGER IF EXISTS {table}_search_{event}" for event in ('insert', 'update', 'delete')
+    ]
+
+FILL_SQLITE_SEARCH = [
+    f"""
+    INSERT INTO api_ledger_search (rowid, description, kind, entry_id, family_member_id)
+    SELECT id * 3 + {offset}, description, '{kind}', id, family_member_id FROM {table}
+    """
+    for table, (kind, offset) in SEARCHED_TABLES.items()
+]
+
+# PostgreSQL: trigram GIN indexes answer the word similarity operator (<%) of api/search.py
+CREATE_POSTGRESQL_SEARCH = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX IF NOT EXISTS {table}_description_trgm_idx ON {table} USING gin (description gin_trgm_ops)"
+    for table in SEARCHED_TABLES
+]
+DROP_POSTGRESQL_SEARCH = [
+    f"DROP INDEX IF EXISTS {table}_description_trgm_idx" for table in SEARCHED_TABLES
+]
+
+
+def run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run(schema_editor, CREATE_SQLITE_SEARCH + FILL_SQLITE_SEARCH + CREATE_SQLITE_SEARCH_TRIGGERS)
+    elif vendor == 'postgresql':
+        run(schema_editor, CREATE_POSTGRESQL_SEARCH)
+
+
+def drop_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run(schema_editor, DROP_SQLITE_SEARCH_TRIGGERS + DROP_SQLITE_SEARCH)
+    elif vendor == 'postgresql':
+        run(schema_editor, DROP_POSTGRESQL_SEARCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_ledgermonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+LEDGER_TABLES = ['api_expense', 'api_mile', 'api_hour']
+
+
+def create_brin_indexes(apps, schema_editor):
+    # Rows arrive roughly in created_at order, so on PostgreSQL a BRIN index answers
+    # date ranges across all families (month-end runs, exports) at a fraction of a B-tree's size
+    if schema_editor.connection.vendor == 'postgresql':
+        for table in LEDGER_TABLES:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_created_brin_idx ON {table} USING brin (created_at)"
+            )
+
+
+def drop_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for table in LEDGER_TABLES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_created_brin_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_ledger_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['family_member', 'amount'], name='api_expense_member_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hour',
+            index=models.Index(fields=['family_member', 'hours'], name='api_hour_member_hours_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mile',
+            index=models.Index(fields=['family_member', 'miles'], name='api_mile_member_miles_idx'),
+        ),
+        migrations.RunPython(create_brin_indexes, drop_brin_indexes),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .categorization import get_categorizer
 
 
 class FamilyMember(models.Model):
@@ -26,11 +28,16 @@ class FamilyMember(models.Model):
     send_reports = models.BooleanField(default=False, help_text="Whether to send reports to this family member")
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='member', help_text="User role in the family")
     can_view_all = models.BooleanField(default=False, help_text="Can view all family members' data")
+    # Family data version of the last write, for delta sync
+    sync_version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='api_member_user_sync_idx'),
+        ]
         # Allow multiple family members per user
         # unique_together = ['user']
     
@@ -43,14 +50,43 @@ class Expense(models.Model):
     family_member = models.ForeignKey(FamilyMember, on_delete=models.CASCADE, related_name='expenses')
     description = models.CharField(max_length=200)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Tax categorization, derived from description and amount on every save
+    tax_category = models.CharField(max_length=50, blank=True, db_index=True)
+    tax_deductible = models.BooleanField(default=False)
+    tax_confidence = models.FloatField(default=0)
+    suggested_form = models.CharField(max_length=50, blank=True)
+    # Family data version of the last write, for delta sync
+    sync_version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-member listings newest first and year/date range filters
+            models.Index(fields=['family_member', 'created_at'], name='api_expense_member_created_idx'),
+            models.Index(fields=['family_member', 'sync_version'], name='api_expense_member_sync_idx'),
+            # min/max filters on the ledger lists
+            models.Index(fields=['family_member', 'amount'], name='api_expense_member_amount_idx'),
+        ]
     
     def __str__(self):
         return f"{self.description} - ${self.amount}"
+    
+    def save(self, *args, **kwargs):
+        self.apply_tax_category()
+        super().save(*args, **kwargs)
+    
+    def apply_tax_category(self):
+        """Categorize this expense with the current tax rules"""
+        self.apply_tax_info(get_categorizer().categorize(self.description, float(self.amount)))
+    
+    def apply_tax_info(self, tax_info):
+        """Copy a categorization result onto the tax fields"""
+        self.tax_category = tax_info['category']
+        self.tax_deductible = tax_info['tax_deductible']
+        self.tax_confidence = tax_info['confidence']
+        self.suggested_form = tax_info['suggested_form']
 
 
 class Mile(models.Model):
@@ -58,11 +94,20 @@ class Mile(models.Model):
     family_member = models.ForeignKey(FamilyMember, on_delete=models.CASCADE, related_name='miles')
     description = models.CharField(max_length=200)
     miles = models.DecimalField(max_digits=8, decimal_places=2)
+    # Family data version of the last write, for delta sync
+    sync_version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-member listings newest first and year/date range filters
+            models.Index(fields=['family_member', 'created_at'], name='api_mile_member_created_idx'),
+            models.Index(fields=['family_member', 'sync_version'], name='api_mile_member_sync_idx'),
+            # min/max filters on the ledger lists
+            models.Index(fields=['family_member', 'miles'], name='api_mile_member_miles_idx'),
+        ]
     
     def __str__(self):
         return f"{self.description} - {self.miles} miles"
@@ -73,11 +118,211 @@ class Hour(models.Model):
     family_member = models.ForeignKey(FamilyMember, on_delete=models.CASCADE, related_name='hours')
     description = models.CharField(max_length=200)
     hours = models.DecimalField(max_digits=6, decimal_places=2)
+    # Family data version of the last write, for delta sync
+    sync_version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-member listings newest first and year/date range filters
+            models.Index(fields=['family_member', 'created_at'], name='api_hour_member_created_idx'),
+            models.Index(fields=['family_member', 'sync_version'], name='api_hour_member_sync_idx'),
+            # min/max filters on the ledger lists
+            models.Index(fields=['family_member', 'hours'], name='api_hour_member_hours_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.description} - {self.hours} hours"
+
+class LedgerRollup(models.Model):
+    """Running totals of a family member's expenses, miles and hours"""
+    family_member = models.OneToOneField(FamilyMember, on_delete=models.CASCADE, related_name='ledger_rollup')
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+    mile_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    mile_count = models.PositiveIntegerField(default=0)
+    hour_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    hour_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Rollup for {self.family_member_id}"
+
+
+class LedgerMonthlyRollup(models.Model):
+    """A family member's expense, mile and hour totals for one calendar month"""
+    family_member = models.ForeignKey(FamilyMember, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField(help_text="First day of the month")
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+    mile_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    mile_count = models.PositiveIntegerField(default=0)
+    hour_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    hour_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['family_member', 'month'], name='api_monthly_rollup_member_month_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"Rollup for {self.family_member_id} in {self.month:%Y-%m}"
+
+
+class ReadOnlyUserError(TypeError):
+    """Raised when a ClaimsUser is saved or deleted"""
+
+
+class ClaimsUser(User):
+    """
+    request.user built from access token claims (api/authentication.py).
+    
+    Carries only the fields the token holds, so it can be used in queries
+    and relations but never written back over the real user row.
+    """
+    
+    class Meta:
+        proxy = True
+    
+    def save(self, *args, **kwargs):
+        raise ReadOnlyUserError('ClaimsUser is built from token claims, load the User to save it.')
+    
+    def delete(self, *args, **kwargs):
+        raise ReadOnlyUserError('ClaimsUser is built from token claims, load the User to delete it.')
+
+
+class FamilyDataVersion(models.Model):
+    """Counter bumped by every write to a family's members or ledgers"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Data version {self.version} for {self.user_id}"
+
+
+class Tombstone(models.Model):
+    """Deleted family member or ledger row, reported by the delta sync endpoint"""
+    KIND_CHOICES = [
+        ('family_member', 'Family member'),
+        ('expense', 'Expense'),
+        ('mile', 'Mile'),
+        ('hour', 'Hour'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    sync_version = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='api_tombstone_user_sync_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+
+class ExportJob(models.Model):
+    """Background export of a year's transactions"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('excel', 'Excel'),
+        ('csv', 'CSV'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    year = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='excel')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    data_version = models.CharField(max_length=32, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_format_display()} export {self.year} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """Email queued by the API and delivered by the send_outbox worker"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbound_emails', null=True, blank=True)
+    kind = models.CharField(max_length=30)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='api_outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} email to {self.to_email} ({self.status})"
+
+
+class LedgerEntry(models.Model):
+    """
+    Read-only view over expenses, miles and hours as one ledger.
+    
+    Backed by the api_ledger_entry SQL view (a UNION ALL of the three
+    tables), so cross-type timelines and exports are single queries that
+    still use each table's indexes. Writes go to Expense, Mile and Hour.
+    """
+    KIND_CHOICES = [
+        ('expense', 'Expense'),
+        ('mile', 'Mile'),
+        ('hour', 'Hour'),
+    ]
+    
+    key = models.CharField(max_length=40, primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    entry_id = models.BigIntegerField()
+    family_member = models.ForeignKey(FamilyMember, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    description = models.CharField(max_length=200)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    tax_category = models.CharField(max_length=50)
+    tax_deductible = models.BooleanField()
+    tax_confidence = models.FloatField()
+    suggested_form = models.CharField(max_length=50)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        managed = False
+        db_table = 'api_ledger_entry'
+        ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.description} - {self.hours} hours"
\ No newline at end of file
+        return f"{self.kind}: {self.description} - {self.quantity}"
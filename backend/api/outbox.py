@@ -0,0 +1,142 @@
+# Email outbox for Family Bookkeeping
+import logging
+import smtplib
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Rows the worker may claim: new ones and ones whose sender died mid-batch (lease expired)
+CLAIMABLE_STATUSES = ('pending', 'sending')
+
+
+def outbound_email(message, kind, user=None):
+    """Unsaved outbox row for an EmailMessage (e.g. from EmailService.build_*), one per recipient"""
+    html_body = next((content for content, mimetype in getattr(message, 'alternatives', []) if mimetype == 'text/html'), '')
+    return [
+        OutboundEmail(
+            user=user, kind=kind, to_email=recipient, from_email=message.from_email,
+            subject=message.subject, body=message.body, html_body=html_body,
+        )
+        for recipient in message.to
+    ]
+
+
+def enqueue_emails(messages, kind, user=None):
+    """Queue messages for the send_outbox worker and return their outbox rows"""
+    return OutboundEmail.objects.bulk_create([
+        email for message in messages for email in outbound_email(message, kind, user)
+    ])
+
+
+async def aenqueue_emails(messages, kind, user=None):
+    """Async enqueue_emails()"""
+    return await OutboundEmail.objects.abulk_create([
+        email for message in messages for email in outbound_email(message, kind, user)
+    ])
+
+
+def to_message(email, connection=None):
+    """The EmailMessage an outbox row is delivered as"""
+    message = EmailMultiAlternatives(
+        subject=email.subject, body=email.body, from_email=email.from_email, to=[email.to_email], connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff before the next try of a message that failed `attempts` times: EMAIL_OUTBOX_RETRY_DELAY, doubled each time"""
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_due_emails(batch_size):
+    """
+    Mark up to batch_size due emails as sending and return them.
+
+    Claimed rows are leased for EMAIL_OUTBOX_LEASE seconds; if the worker
+    dies before recording the outcome they become due again. Concurrent
+    workers skip each other's locked rows on databases with row locks.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=CLAIMABLE_STATUSES, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status='sending', attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE),
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def send_outbox_batch(batch_size=None, connection=None):
+    """
+    Deliver one batch of due emails over a single connection.
+
+    Every message is sent separately so each row gets its own outcome:
+    sent, pending again after retry_delay(), or failed once it has used
+    EMAIL_OUTBOX_MAX_ATTEMPTS or the server refused the recipient. A
+    connection passed in is left open for the next batch. Returns the
+    number of emails per outcome.
+    """
+    emails = claim_due_emails(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    counts = {'sent': 0, 'retry': 0, 'failed': 0}
+    if not emails:
+        return counts
+
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not connect to the mail server: {str(e)}")
+        for email in emails:
+            counts[_record_failure(email, e)] += 1
+        _save_outcomes(emails)
+        return counts
+
+    try:
+        for email in emails:
+            try:
+                # No-op while the connection is open
+                connection.open()
+                connection.send_messages([to_message(email, connection)])
+            except Exception as e:
+                logger.error(f"Failed to send {email.kind} email {email.id} to {email.to_email}: {str(e)}")
+                counts[_record_failure(email, e)] += 1
+                # The session may be unusable now, reconnect for the next message
+                connection.close()
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                counts['sent'] += 1
+    finally:
+        if own_connection:
+            connection.close()
+        _save_outcomes(emails)
+    return counts
+
+
+def _record_failure(email, error):
+    email.last_error = str(error)
+    if isinstance(error, smtplib.SMTPRecipientsRefused) or email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+        return 'failed'
+    email.status = 'pending'
+    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    return 'retry'
+
+
+def _save_outcomes(emails):
+    OutboundEmail.objects.bulk_update(emails, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
@@ -0,0 +1,69 @@
+import json
+from decimal import Decimal
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Accept a ?format= value for views that build their own HttpResponse.
+    
+    DRF treats the 'format' query parameter as a renderer override and
+    answers 404 when no renderer claims it, so export views list these
+    renderers to let 'csv' and 'excel' reach the view. Error payloads
+    returned as a Response are still rendered as JSON.
+    """
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, str)):
+            return data
+        return json.dumps(data)
+
+
+class CSVPassthroughRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ExcelPassthroughRenderer(PassthroughRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'excel'
+    charset = None
+
+
+class DecimalStringEncoder(JSONEncoder):
+    """DRF's encoder, but with Decimals as strings like DecimalField renders them"""
+    
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer backed by orjson, falling back to the standard one.
+    
+    Output matches JSONRenderer for serializer data (datetimes with a 'Z'
+    suffix, lazy strings, UUIDs), and Decimals in raw values() rows come
+    out as strings like DecimalField renders them.
+    """
+    encoder_class = DecimalStringEncoder
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=option)
+        # Escape the JavaScript line terminators as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,235 @@
+# Reports for Family Bookkeeping
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+from .ledger import LEDGER_KINDS
+from .models import Expense, LedgerMonthlyRollup
+
+# Bucket sizes of ledger_trend(), finest first
+TREND_PERIODS = ('day', 'week', 'month', 'year')
+
+# Ledger tables are grouped with these for the buckets finer than the monthly rollups
+TREND_TRUNCATIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+
+
+def tax_report_rows(user_id, year):
+    """Expenses are categorized when written, so the report is one grouped query"""
+    return Expense.objects.filter(
+        family_member__user_id=user_id, created_at__year=year
+    ).values('tax_category', 'tax_deductible', 'suggested_form').annotate(
+        total=Sum('amount'), count=Count('id'), confidence=Sum('tax_confidence')
+    ).order_by()
+
+
+def build_tax_report(user_id, year):
+    """Tax categories, deductible totals and recommendations for a family's year"""
+    return summarize_tax_report(year, tax_report_rows(user_id, year))
+
+
+async def abuild_tax_report(user_id, year):
+    """Async build_tax_report()"""
+    return summarize_tax_report(year, [row async for row in tax_report_rows(user_id, year)])
+
+
+def summarize_tax_report(year, rows):
+    tax_data = {
+        'year': year,
+        'total_deductible': 0,
+        'categories': {},
+        'recommendations': [],
+        'forms_needed': set()
+    }
+    
+    for row in rows:
+        category = tax_data['categories'].setdefault(row['tax_category'], {
+            'total': 0,
+            'count': 0,
+            'deductible': 0,
+            'confidence': 0
+        })
+        category['total'] += float(row['total'])
+        category['count'] += row['count']
+        category['confidence'] += row['confidence']
+        
+        if row['tax_deductible']:
+            category['deductible'] += float(row['total'])
+            tax_data['total_deductible'] += float(row['total'])
+            tax_data['forms_needed'].add(row['suggested_form'])
+    
+    # Calculate average confidence
+    for category in tax_data['categories']:
+        if tax_data['categories'][category]['count'] > 0:
+            tax_data['categories'][category]['confidence'] /= tax_data['categories'][category]['count']
+    
+    # Generate AI recommendations
+    if tax_data['total_deductible'] > 0:
+        tax_data['recommendations'].append(f"Total potential tax deductions: ${tax_data['total_deductible']:,.2f}")
+    
+    if 'Medical Expense' in tax_data['categories']:
+        medical_total = tax_data['categories']['Medical Expense']['deductible']
+        if medical_total > 0:
+            tax_data['recommendations'].append(f"Medical expenses: ${medical_total:,.2f} (may be deductible if > 7.5% of AGI)")
+    
+    if 'Business Expense' in tax_data['categories']:
+        business_total = tax_data['categories']['Business Expense']['deductible']
+        if business_total > 0:
+            tax_data['recommendations'].append(f"Business expenses: ${business_total:,.2f} (Schedule C required)")
+    
+    tax_data['forms_needed'] = list(tax_data['forms_needed'])
+    
+    return tax_data
+
+
+def tax_report_cache_key(user_id, year):
+    return f'tax_report:{user_id}:{year}'
+
+
+def cached_tax_report(user_id, year):
+    """
+    The tax report from Django's cache, building and storing it on a miss.
+    
+    A hit runs no queries. Every expense write drops the reports of the
+    (user, year)s it touches (invalidate_tax_reports()), so a closed year
+    stays cached until one of its own expenses changes. With a per-process
+    cache the other workers only drop theirs after TAX_REPORT_CACHE_TIMEOUT.
+    """
+    key = tax_report_cache_key(user_id, year)
+    tax_data = cache.get(key)
+    if tax_data is None:
+        tax_data = build_tax_report(user_id, year)
+        cache.set(key, tax_data, settings.TAX_REPORT_CACHE_TIMEOUT)
+    return tax_data
+
+
+async def acached_tax_report(user_id, year):
+    """Async cached_tax_report()"""
+    key = tax_report_cache_key(user_id, year)
+    tax_data = await cache.aget(key)
+    if tax_data is None:
+        tax_data = await abuild_tax_report(user_id, year)
+        await cache.aset(key, tax_data, settings.TAX_REPORT_CACHE_TIMEOUT)
+    return tax_data
+
+
+def expense_tax_year(expense):
+    """The year whose tax report counts the expense (created_at__year, in the current time zone)"""
+    return timezone.localtime(expense.created_at).year
+
+
+def invalidate_tax_reports(user_years):
+    """
+    Drop the cached tax reports of (user id, year) pairs whose expenses changed.
+    
+    Dropped now and again once the transaction commits, so a report a
+    concurrent request rebuilt from the rows before the commit goes too.
+    """
+    keys = [tax_report_cache_key(user_id, year) for user_id, year in set(user_years)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def family_report_data(totals, expenses):
+    """Payload of the family report email: rollup totals and the latest expenses"""
+    return {
+        'summary': {
+            'totalExpenses': totals['total_expenses'],
+            'totalMiles': totals['total_miles'],
+            'totalHours': totals['total_hours']
+        },
+        'expenses': [
+            {
+                'description': expense.description,
+                'amount': float(expense.amount),
+                'created_at': expense.created_at.isoformat()
+            } for expense in expenses
+        ]
+    }
+
+
+def monthly_family_totals(start, end, user_ids):
+    """
+    Ledger totals of many families for the period [start, end).
+    
+    One grouped query per ledger table covers every family in user_ids (a
+    list or a values_list() subquery). Returns {user_id: summary} with the
+    keys of rollup_statistics() plus total_deductions, the sum of the
+    expenses categorized as tax deductible.
+    """
+    totals = defaultdict(lambda: {'total_expenses': 0.0, 'total_miles': 0.0, 'total_hours': 0.0, 'total_deductions': 0.0})
+    for model, (kind, value_field) in LEDGER_KINDS.items():
+        aggregates = {'total': Sum(value_field)}
+        if model is Expense:
+            aggregates['deductions'] = Sum(value_field, filter=Q(tax_deductible=True))
+        rows = model.objects.filter(
+            family_member__user_id__in=user_ids, created_at__gte=start, created_at__lt=end
+        ).values(user_id=F('family_member__user_id')).annotate(**aggregates).order_by()
+        for row in rows:
+            summary = totals[row['user_id']]
+            summary[f'total_{kind}s'] = float(row['total'] or 0)
+            if 'deductions' in row:
+                summary['total_deductions'] = float(row['deductions'] or 0)
+    return totals
+
+
+def ledger_trend(member_ids, period, start, end, kinds):
+    """
+    Totals and counts per member, ledger kind and period bucket from start to end (dates, inclusive).
+    
+    Month and year buckets are summed from the monthly rollups and cover
+    the whole months touched by the range, so a five year chart reads at
+    most 60 rows per member. Day and week buckets (weeks start on Monday)
+    are grouped from the ledger tables through their (family_member,
+    created_at) indexes. Empty buckets are left out. Returns a list of
+    {'family_member_id', 'kind', 'buckets': [{'start', 'total', 'count'}]}.
+    """
+    series = defaultdict(lambda: defaultdict(lambda: {'total': 0.0, 'count': 0}))
+    
+    if period in TREND_TRUNCATIONS:
+        if period == 'week':
+            start -= timedelta(days=start.weekday())
+        created_range = (
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+        for model, (kind, value_field) in LEDGER_KINDS.items():
+            if kind not in kinds:
+                continue
+            rows = model.objects.filter(
+                family_member_id__in=member_ids, created_at__gte=created_range[0], created_at__lt=created_range[1]
+            ).values(
+                'family_member_id', bucket=TREND_TRUNCATIONS[period]('created_at', output_field=DateField())
+            ).annotate(total=Sum(value_field), count=Count('id')).order_by()
+            for row in rows:
+                series[(row['family_member_id'], kind)][row['bucket']] = {
+                    'total': float(row['total'] or 0), 'count': row['count']
+                }
+    else:
+        rollups = LedgerMonthlyRollup.objects.filter(
+            family_member_id__in=member_ids, month__gte=start.replace(day=1), month__lte=end
+        ).values('family_member_id', 'month', *(f'{kind}_{column}' for kind in kinds for column in ('total', 'count')))
+        for rollup in rollups:
+            bucket = rollup['month'] if period == 'month' else rollup['month'].replace(month=1)
+            for kind in kinds:
+                if not rollup[f'{kind}_count']:
+                    continue
+                totals = series[(rollup['family_member_id'], kind)][bucket]
+                totals['total'] += float(rollup[f'{kind}_total'])
+                totals['count'] += rollup[f'{kind}_count']
+    
+    return [
+        {
+            'family_member_id': member_id,
+            'kind': kind,
+            'buckets': [{'start': bucket, **totals} for bucket, totals in sorted(buckets.items())],
+        }
+        for (member_id, kind), buckets in sorted(series.items())
+    ]
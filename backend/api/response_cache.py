@@ -0,0 +1,144 @@
+# Per-family response cache for Family Bookkeeping
+import asyncio
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+from .versions import aget_data_version, get_data_version
+
+# Names of the views wrapped by family_cached, in the order they were wrapped
+CACHED_VIEWS = []
+
+COUNTER_OUTCOMES = ('hits', 'misses')
+
+
+def generation_key(user_id):
+    return f'response-cache:generation:{user_id}'
+
+
+def counter_key(view_name, outcome):
+    return f'response-cache:{outcome}:{view_name}'
+
+
+def response_key(request, view_name, version, generation):
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f'response-cache:{request.user.id}:{version}:{generation}:{view_name}:{path}'
+
+
+def invalidate_family_responses(user_id):
+    """
+    Retire every cached response of the user's family.
+
+    Writes through LedgerChanges already advance the family data version
+    the entries are keyed by. This covers the others (admin, shell, data
+    migrations) by starting a new generation once the transaction commits.
+    """
+    transaction.on_commit(lambda: cache.set(generation_key(user_id), time.time_ns(), None))
+
+
+def _new_generation(user_id):
+    # The first read, or the generation was evicted: never fall back to a value older entries used
+    cache.add(generation_key(user_id), time.time_ns(), None)
+    return cache.get(generation_key(user_id))
+
+
+async def _anew_generation(user_id):
+    await cache.aadd(generation_key(user_id), time.time_ns(), None)
+    return await cache.aget(generation_key(user_id))
+
+
+def _count(view_name, outcome):
+    key = counter_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+async def _acount(view_name, outcome):
+    key = counter_key(view_name, outcome)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, None)
+        await cache.aincr(key)
+
+
+def response_cache_stats():
+    """{view name: {'hits', 'misses', 'hit_rate'}} from the shared counters"""
+    counts = cache.get_many([counter_key(name, outcome) for name in CACHED_VIEWS for outcome in COUNTER_OUTCOMES])
+    stats = {}
+    for name in CACHED_VIEWS:
+        hits, misses = (counts.get(counter_key(name, outcome), 0) for outcome in COUNTER_OUTCOMES)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def family_cached(view):
+    """
+    Serve a read-only view from the cache, keyed by the family and its data version.
+
+    A successful response is stored for RESPONSE_CACHE_TIMEOUT seconds
+    (0 turns caching off) under the user's id, the family data version,
+    the family's cache generation and the full path, so any write to the
+    family misses every entry stored before it. Under @data_versioned the
+    version it already read is reused. Sync views cache the DRF Response
+    data, async views (api/async_views.py) the rendered JSON.
+    """
+    view_name = view.__name__
+    if view_name not in CACHED_VIEWS:
+        CACHED_VIEWS.append(view_name)
+
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_TIMEOUT:
+                return await view(request, *args, **kwargs)
+            version = getattr(request, 'family_data_version', None)
+            if version is None:
+                version = (await aget_data_version(request.user))[0]
+            generation = await cache.aget(generation_key(request.user.id)) or await _anew_generation(request.user.id)
+            # Apart from the sync view's entries, which hold Response data rather than JSON
+            key = response_key(request, f'{view_name}:json', version, generation)
+            cached = await cache.aget(key)
+            if cached is not None:
+                await _acount(view_name, 'hits')
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            await _acount(view_name, 'misses')
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, (response.content, response['Content-Type']), settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_TIMEOUT:
+            return view(request, *args, **kwargs)
+        version = getattr(request, 'family_data_version', None)
+        if version is None:
+            version = get_data_version(request.user)[0]
+        generation = cache.get(generation_key(request.user.id)) or _new_generation(request.user.id)
+        key = response_key(request, view_name, version, generation)
+        data = cache.get(key)
+        if data is not None:
+            _count(view_name, 'hits')
+            return Response(data)
+
+        _count(view_name, 'misses')
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+    return wrapper
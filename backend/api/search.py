@@ -0,0 +1,152 @@
+# Ledger search for Family Bookkeeping
+import re
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, Value
+from .ledger import family_ledger
+from .models import LedgerEntry
+
+# Ledger table -> (kind, rowid offset) in the SQLite FTS5 index api_ledger_search of migration 0017
+SEARCHED_TABLES = {
+    'api_expense': ('expense', 0),
+    'api_mile': ('mile', 1),
+    'api_hour': ('hour', 2),
+}
+
+
+def search_ledger(member_ids, query, kinds=None):
+    """
+    The members' expenses, miles and hours whose description matches query, best match first.
+
+    Every row carries a rank, higher for better matches. On PostgreSQL
+    matching is fuzzy (trigram word similarity through the GIN indexes of
+    migration 0017), on SQLite it is a prefix match of every word through
+    the FTS5 table api_ledger_search ranked by bm25. Other databases fall
+    back to a substring match, newest first and without a rank. Either
+    result works with Django's Paginator, so with DRF's paginators too.
+    """
+    member_ids = list(member_ids)
+    terms = re.findall(r'\w+', query)
+    if not terms or not member_ids:
+        return LedgerEntry.objects.none()
+
+    vendor = connections[router.db_for_read(LedgerEntry)].vendor
+    if vendor == 'sqlite':
+        return FTSLedgerSearch(member_ids, ' '.join(f'"{term}"*' for term in terms), kinds)
+
+    queryset = family_ledger(member_ids).select_related('family_member')
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    if vendor == 'postgresql':
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return queryset.filter(TrigramWordSimilar(F('description'), query)).annotate(
+            rank=TrigramWordSimilarity(query, 'description')
+        ).order_by('-rank', '-created_at', '-key')
+    return queryset.filter(description__icontains=query).annotate(
+        rank=Value(None, output_field=FloatField())
+    ).order_by('-created_at', '-key')
+
+
+class FTSLedgerSearch:
+    """
+    FTS5 matches as a sliceable, countable sequence of LedgerEntry rows.
+
+    Each slice runs one ranked query on api_ledger_search and loads its
+    rows from the ledger view by id.
+    """
+
+    def __init__(self, member_ids, match, kinds=None):
+        self.member_ids = member_ids
+        self.where = f"api_ledger_search MATCH %s AND family_member_id IN ({', '.join(['%s'] * len(member_ids))})"
+        self.params = [match, *member_ids]
+        if kinds:
+            self.where += f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+            self.params += list(kinds)
+
+    def _execute(self, sql, params):
+        with connections[router.db_for_read(LedgerEntry)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        return self._execute(f"SELECT COUNT(*) FROM api_ledger_search WHERE {self.where}", self.params)[0][0]
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice) or page.step is not None:
+            raise TypeError('FTSLedgerSearch only supports slices')
+        start = page.start or 0
+        limit = -1 if page.stop is None else max(page.stop - start, 0)
+        matches = self._execute(
+            f"SELECT kind, entry_id, rank FROM api_ledger_search WHERE {self.where} "
+            f"ORDER BY rank, rowid DESC LIMIT %s OFFSET %s",
+            [*self.params, limit, start],
+        )
+        if not matches:
+            return []
+
+        entries = family_ledger(self.member_ids).filter(
+            entry_id__in={entry_id for _, entry_id, _ in matches}
+        ).select_related('family_member').in_bulk()
+        results = []
+        for kind, entry_id, rank in matches:
+            entry = entries.get(f'{kind}-{entry_id}')
+            if entry is not None:
+                # bm25 is lower for better matches
+                entry.rank = -rank
+                results.append(entry)
+        return results
+
+
+def sqlite_search_triggers():
+    """Trigger name -> CREATE TRIGGER statement keeping api_ledger_search in step with the ledger tables"""
+    triggers = {}
+    for table, (kind, offset) in SEARCHED_TABLES.items():
+        triggers[f'{table}_search_insert'] = f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO api_ledger_search (rowid, description, kind, entry_id, family_member_id)
+                VALUES (new.id * 3 + {offset}, new.description, '{kind}', new.id, new.family_member_id);
+            END
+        """
+        triggers[f'{table}_search_update'] = f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF description, family_member_id ON {table} BEGIN
+                UPDATE api_ledger_search SET description = new.description, family_member_id = new.family_member_id
+                WHERE rowid = old.id * 3 + {offset};
+            END
+        """
+        triggers[f'{table}_search_delete'] = f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM api_ledger_search WHERE rowid = old.id * 3 + {offset};
+            END
+        """
+    return triggers
+
+
+def restore_search_triggers(using):
+    """
+    Recreate SQLite search triggers dropped by a table rebuild and reindex.
+
+    SQLite rebuilds a table for most field changes, which drops its
+    triggers, so this runs after every migrate (api/signals.py). Writes
+    made while a trigger was missing are caught up by refilling the index.
+    Returns whether any trigger was missing.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    triggers = sqlite_search_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {name for name, in cursor.fetchall()}
+        if 'api_ledger_search' not in existing or existing >= set(triggers):
+            # Not migrated that far yet, or nothing dropped
+            return False
+        with transaction.atomic(using=using):
+            for statement in triggers.values():
+                cursor.execute(statement)
+            cursor.execute('DELETE FROM api_ledger_search')
+            for table, (kind, offset) in SEARCHED_TABLES.items():
+                cursor.execute(
+                    f"INSERT INTO api_ledger_search (rowid, description, kind, entry_id, family_member_id) "
+                    f"SELECT id * 3 + {offset}, description, '{kind}', id, family_member_id FROM {table}"
+                )
+    return True
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import FamilyMember, Expense, Mile, Hour
+from .models import FamilyMember, Expense, Mile, Hour, LedgerEntry, ExportJob, OutboundEmail
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -49,6 +49,41 @@ class HourSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    """Serializer for the combined LedgerEntry view"""
+    family_member_name = serializers.CharField(source='family_member.name', read_only=True)
+    
+    class Meta:
+        model = LedgerEntry
+        fields = ['key', 'kind', 'entry_id', 'description', 'quantity', 'family_member', 'family_member_name', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class LedgerSearchResultSerializer(LedgerEntrySerializer):
+    """A ledger entry matched by a search, with its rank (higher is better)"""
+    rank = serializers.FloatField(read_only=True, allow_null=True)
+    
+    class Meta(LedgerEntrySerializer.Meta):
+        fields = LedgerEntrySerializer.Meta.fields + ['rank']
+        read_only_fields = fields
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer for ExportJob model"""
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'year', 'format', 'status', 'data_version', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class OutboundEmailSerializer(serializers.ModelSerializer):
+    """Serializer for OutboundEmail model (delivery status, without the content)"""
+    class Meta:
+        model = OutboundEmail
+        fields = ['id', 'kind', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at']
+        read_only_fields = fields
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(write_only=True, min_length=8)
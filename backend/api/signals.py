@@ -0,0 +1,62 @@
+# Model signal handlers for Family Bookkeeping
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .models import FamilyMember, Expense, Mile, Hour, Tombstone
+from .authentication import forget_user
+from .ledger import ledger_writes_tracked, record_untracked_write
+from .response_cache import invalidate_family_responses
+from .search import restore_search_triggers
+from .versions import bump_data_versions
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Mile)
+@receiver(post_delete, sender=Mile)
+@receiver(post_save, sender=Hour)
+@receiver(post_delete, sender=Hour)
+def ledger_entry_changed(sender, instance, signal, origin=None, **kwargs):
+    """Version a write made outside LedgerChanges, then drop the family's cached responses"""
+    if isinstance(origin, (User, FamilyMember)):
+        # Deleted with its member or account, whose own tombstone covers the row
+        return
+    try:
+        user_id = instance.family_member.user_id
+    except FamilyMember.DoesNotExist:
+        return
+    if not ledger_writes_tracked():
+        record_untracked_write(instance, deleted=signal is post_delete)
+    invalidate_family_responses(user_id)
+
+
+@receiver(post_save, sender=FamilyMember)
+def family_member_saved(sender, instance, **kwargs):
+    """Bump the family data version and stamp the member with it for delta sync"""
+    version = bump_data_versions([instance.user_id])[instance.user_id]
+    FamilyMember.objects.filter(pk=instance.pk).update(sync_version=version)
+    instance.sync_version = version
+
+
+@receiver(post_delete, sender=FamilyMember)
+def family_member_deleted(sender, instance, origin=None, **kwargs):
+    """Bump the family data version and leave a tombstone for delta sync"""
+    if isinstance(origin, User):
+        # The whole account is being deleted, its versions and tombstones go with it
+        return
+    version = bump_data_versions([instance.user_id])[instance.user_id]
+    Tombstone.objects.create(user_id=instance.user_id, kind='family_member', object_id=instance.pk, sync_version=version)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Re-check the active flag on this process's next request of the user"""
+    forget_user(instance.pk)
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    """Put back the search triggers a migration's table rebuild dropped"""
+    if sender.name == 'api':
+        restore_search_triggers(using)
@@ -1,3 +1,1155 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import random
+import runpy
+import smtplib
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import IntegrityError, connection, models
+from django.db.models import QuerySet, Sum
+from django.db.models.functions import TruncDay
+from django.http import HttpRequest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from . import async_views
+from .authentication import ClaimsJWTAuthentication, tokens_for_user
+from .categorization import get_categorizer, reload_rules
+from .exports import EXPORT_COLUMNS, iter_export_rows
+from .family import get_family
+from .models import (
+    ClaimsUser, ExportJob, FamilyDataVersion, FamilyMember, Expense, Mile, Hour, LedgerMonthlyRollup, LedgerRollup,
+    OutboundEmail, ReadOnlyUserError, Tombstone
+)
+from .ledger import LedgerChanges, LedgerRange, family_ledger, rebuild_rollups
+from .pagination import LedgerCursorPagination
+from .renderers import ORJSONRenderer
+from .reports import tax_report_cache_key
+from .serializers import ExpenseSerializer, HourSerializer, MileSerializer
 
-# Create your tests here.
+# (model, value field, composite index name) for each ledger table
+LEDGERS = [
+    (Expense, 'amount', 'api_expense_member_created_idx'),
+    (Mile, 'miles', 'api_mile_member_created_idx'),
+    (Hour, 'hours', 'api_hour_member_created_idx'),
+]
+
+
+class LedgerQueryPlanTests(TestCase):
+    """
+    Guard the query plans of the hot ledger queries in api/views.py.
+
+    Seeds a few families with several years of history, refreshes the
+    planner statistics and asserts that each query is answered through the
+    (family_member, created_at) index instead of a full scan or an
+    in-memory sort. A plan regression (a dropped index, a query rewritten
+    so the index no longer applies) fails here.
+    """
+
+    FAMILIES = 20
+    MEMBERS_PER_FAMILY = 4
+    ROWS_PER_MEMBER = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(9)
+        start = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+        cls.members = []
+        for family in range(cls.FAMILIES):
+            user = User.objects.create(username=f'family{family}')
+            for index in range(cls.MEMBERS_PER_FAMILY):
+                cls.members.append(FamilyMember.objects.create(
+                    user=user, name=f'Member {family}-{index}', relation='Self' if index == 0 else 'Child'
+                ))
+        cls.user = cls.members[0].user
+        cls.member = cls.members[0]
+
+        for model, value_field, _ in LEDGERS:
+            entries = [
+                model(family_member=member, description=f'Entry {index}', **{value_field: Decimal('12.50')})
+                for member in cls.members for index in range(cls.ROWS_PER_MEMBER)
+            ]
+            # Spread the auto_now_add timestamps over three years
+            random_now = lambda: start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+            with mock.patch('django.utils.timezone.now', side_effect=random_now):
+                model.objects.bulk_create(entries, batch_size=1000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'Expected {index_name} in plan:\n{plan}\nfor\n{queryset.query}')
+        return plan
+
+    def assertNoSort(self, plan):
+        # SQLite reports in-memory sorts as "USE TEMP B-TREE FOR ORDER BY"
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_member_listing_newest_first(self):
+        # List views filtered by family_member_id
+        for model, _, index_name in LEDGERS:
+            queryset = model.objects.filter(
+                family_member__user=self.user, family_member_id=self.member.id
+            ).order_by('-created_at')
+            self.assertNoSort(self.assertUsesIndex(queryset, index_name))
+
+    def test_member_year_filter(self):
+        # get_family_member_data / send_family_report style per-member reads for one year
+        for model, _, index_name in LEDGERS:
+            queryset = model.objects.filter(family_member=self.member, created_at__year=2024)
+            self.assertNoSort(self.assertUsesIndex(queryset, index_name))
+
+    def test_family_year_filter(self):
+        # export_transactions, tax_report and export_data_version
+        for model, _, index_name in LEDGERS:
+            queryset = model.objects.filter(family_member__user=self.user, created_at__year=2024)
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_family_tax_report_group_by(self):
+        queryset = Expense.objects.filter(
+            family_member__user=self.user, created_at__year=2024
+        ).values('tax_category').order_by()
+        self.assertUsesIndex(queryset, 'api_expense_member_created_idx')
+
+    def test_cursor_page(self):
+        # family/all-data/v2/<kind>/ pages for a single member
+        ordering = LedgerCursorPagination.ordering
+        for model, _, index_name in LEDGERS:
+            queryset = model.objects.filter(family_member_id__in=[self.member.id]).order_by(*ordering)[:50]
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_trend_day_buckets(self):
+        # trends/ with period=day or week groups the ledger tables over a date range
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for model, value_field, index_name in LEDGERS:
+            queryset = model.objects.filter(
+                family_member_id__in=[self.member.id], created_at__gte=start, created_at__lt=start + timedelta(days=31)
+            ).values('family_member_id', bucket=TruncDay('created_at')).annotate(total=Sum(value_field)).order_by()
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_range_filters(self):
+        # start/end/min/max on the list, export and statistics endpoints
+        for model, value_field, index_name in LEDGERS:
+            queryset = model.objects.filter(family_member__user=self.user, family_member_id=self.member.id)
+            dates = LedgerRange.from_params({'start': '2024-01-01', 'end': '2024-03-31'})
+            self.assertUsesIndex(dates.filter(queryset, value_field), index_name)
+            # The planner picks (family_member, value) or (family_member, created_at) to skip the sort, never a scan
+            values = LedgerRange.from_params({'min': '500'})
+            self.assertUsesIndex(values.filter(queryset, value_field), f'api_{model._meta.model_name}_member_')
+
+    def test_family_ledger_year(self):
+        # export_transactions rows through the combined LedgerEntry view
+        member_ids = [member.id for member in self.members if member.user_id == self.user.id]
+        queryset = family_ledger(member_ids).filter(created_at__year=2024)
+        for _, _, index_name in LEDGERS:
+            self.assertUsesIndex(queryset, index_name)
+
+
+class CursorPaginationTests(TestCase):
+    """?pagination=cursor pages the ledger lists on (created_at, id)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='cursor-pages')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_traversal_with_equal_created_at(self):
+        expenses = [
+            Expense.objects.create(family_member=self.member, description=f'Expense {number}', amount=Decimal(number))
+            for number in range(1, 9)
+        ]
+        # Three rows share each timestamp, so pages split inside a tie
+        start = timezone.now() - timedelta(days=1)
+        for position, expense in enumerate(expenses):
+            Expense.objects.filter(id=expense.id).update(created_at=start + timedelta(minutes=position // 3))
+        expected = [expense.id for expense in sorted(
+            Expense.objects.filter(family_member=self.member), key=lambda expense: (expense.created_at, expense.id), reverse=True
+        )]
+
+        seen, pages = [], []
+        url, params = '/api/expenses/', {'pagination': 'cursor', 'page_size': 3}
+        while url:
+            page = self.client.get(url, params).data
+            pages.append(page)
+            seen += [row['id'] for row in page['results']]
+            if len(pages) == 1:
+                # Rows added after the first page do not shift the later ones
+                Expense.objects.create(family_member=self.member, description='Newer', amount=Decimal('1'))
+            url, params = page['next'], None
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 2])
+        self.assertNotIn('count', pages[0])
+
+        back = self.client.get(pages[2]['previous']).data
+        self.assertEqual(back['results'], pages[1]['results'])
+        for cursor in ('bogus', base64.b64encode(b'p=["yesterday", "1"]').decode()):
+            response = self.client.get('/api/expenses/', {'pagination': 'cursor', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/expenses/', {'pagination': 'cursor', 'page_size': 10000})
+        self.assertEqual(response.status_code, 200)
+        Expense.objects.bulk_create(
+            Expense(family_member=self.member, description='Bulk', amount=Decimal('1'))
+            for _ in range(LedgerCursorPagination.max_page_size + 1)
+        )
+        page = self.client.get('/api/expenses/', {'pagination': 'cursor', 'page_size': 10000}).data
+        self.assertEqual(len(page['results']), LedgerCursorPagination.max_page_size)
+        self.assertIsNotNone(page['next'])
+
+
+class FamilyResolverTests(TestCase):
+    """The requesting user's family is loaded once per request (api/family.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='resolver')
+        # No 'Self' member: the oldest one stands in for the user
+        self.parent = FamilyMember.objects.create(user=self.user, name='Parent', relation='Spouse')
+        self.child = FamilyMember.objects.create(user=self.user, name='Child', relation='Child')
+        self.other = FamilyMember.objects.create(
+            user=User.objects.create(username='other-family'), name='Other', relation='Self', can_view_all=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_loaded_once_per_request(self):
+        request = HttpRequest()
+        request.user = self.user
+        with self.assertNumQueries(1):
+            family = get_family(request)
+            self.assertIs(get_family(request), family)
+        self.assertEqual((family.self_member, family.member_ids), (self.parent, [self.parent.id, self.child.id]))
+        self.assertIsNone(family.get_member(self.other.id))
+
+        request.user = self.other.user
+        self.assertEqual(get_family(request).self_member, self.other)
+
+    def test_views_share_the_family(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/user/family-member/')
+        self.assertEqual(response.data['id'], self.parent.id)
+
+        self.assertEqual(self.client.get(f'/api/family/member/{self.parent.id}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/family/member/{self.child.id}/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/family/member/{self.other.id}/').status_code, 404)
+        FamilyMember.objects.filter(id=self.parent.id).update(can_view_all=True)
+        self.assertEqual(self.client.get(f'/api/family/member/{self.child.id}/').status_code, 200)
+
+        response = self.client.post(
+            '/api/expenses/', {'family_member': self.other.id, 'description': 'Printer', 'amount': '100'}
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Expense.objects.exists())
+
+
+class FastReadPathTests(TestCase):
+    """Ledger lists served from values() rows answer like the model serializers"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='fast-reads')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent \u2028 Smith', relation='Self')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rows_match_the_serializers(self):
+        Expense.objects.create(family_member=self.member, description='Printer', amount=Decimal('120.50'))
+        Expense.objects.create(family_member=self.member, description='Ink', amount=Decimal('7'))
+        Mile.objects.create(family_member=self.member, description='Drive', miles=Decimal('14.25'))
+        Hour.objects.create(family_member=self.member, description='Volunteering', hours=Decimal('2'))
+        for path, model, serializer_class in (
+            ('/api/expenses/', Expense, ExpenseSerializer),
+            ('/api/miles/', Mile, MileSerializer),
+            ('/api/hours/', Hour, HourSerializer),
+        ):
+            rows = json.loads(self.client.get(path).content)['results']
+            expected = json.loads(JSONRenderer().render(serializer_class(model.objects.all(), many=True).data))
+            self.assertEqual(rows, expected)
+
+    def test_orjson_matches_the_standard_encoder(self):
+        data = {
+            'amount': Decimal('120.50'),
+            'created_at': datetime(2024, 3, 15, 9, 30, 0, 250000, tzinfo=dt_timezone.utc),
+            'day': datetime(2024, 3, 15).date(),
+            'description': 'Line \u2028 separator',
+            'counts': {1: 2},
+            'rows': [{'quantity': Decimal('0.05')}, None],
+        }
+        renderer = ORJSONRenderer()
+        rendered = renderer.render(data)
+        with mock.patch('api.renderers.ORJSON_AVAILABLE', False):
+            self.assertEqual(rendered, renderer.render(data))
+        self.assertEqual(json.loads(rendered)['amount'], '120.50')
+        self.assertEqual(json.loads(rendered)['created_at'], '2024-03-15T09:30:00.250000Z')
+        self.assertIn(b'\\u2028', rendered)
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    """Connection reuse and sizing knobs of the production settings (bookkeeping/settings/production.py)"""
+
+    def load_settings(self, **env):
+        # A fresh import, reading only the given environment
+        with mock.patch.dict(os.environ, env, clear=True), mock.patch.dict(sys.modules):
+            for name in ('bookkeeping.settings.production', 'bookkeeping.settings.base'):
+                sys.modules.pop(name, None)
+            return import_module('bookkeeping.settings.production')
+
+    def test_database_connections(self):
+        database = self.load_settings().DATABASES['default']
+        self.assertEqual(
+            (database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS'], database['DISABLE_SERVER_SIDE_CURSORS']),
+            (60, True, False)
+        )
+        self.assertEqual(database['OPTIONS'], {'connect_timeout': 5})
+
+        # Persistent connections would pile up per request context under ASGI
+        self.assertEqual(self.load_settings(ASYNC_VIEWS='True').DATABASES['default']['CONN_MAX_AGE'], 0)
+
+        database = self.load_settings(
+            DB_CONN_MAX_AGE='300', DB_CONN_HEALTH_CHECKS='False', DB_CONNECT_TIMEOUT='2', DB_POOLER='pgbouncer'
+        ).DATABASES['default']
+        self.assertEqual(
+            (database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS'], database['DISABLE_SERVER_SIDE_CURSORS']),
+            (300, False, True)
+        )
+        self.assertEqual(database['OPTIONS'], {'connect_timeout': 2})
+
+    def test_gunicorn_sizing(self):
+        env = {'GUNICORN_WORKERS': '3', 'GUNICORN_THREADS': '4', 'GUNICORN_MAX_REQUESTS': '1000'}
+        with mock.patch.dict(os.environ, env):
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        self.assertEqual(
+            (config['workers'], config['threads'], config['max_requests'], config['max_requests_jitter']), (3, 4, 1000, 100)
+        )
+
+        server = mock.MagicMock()
+        server.cfg.worker_class_str = 'gthread'
+        config['when_ready'](server)
+        server.log.info.assert_called_once_with('Up to %d database connections (%d workers x %d threads)', 12, 3, 4)
+
+
+class StandInSMTPBackend(locmem.EmailBackend):
+    """
+    Stand-in for an SMTP server: collects mail in mail.outbox like locmem,
+    counts the connections opened and fails for chosen recipients.
+    """
+    connections = 0
+    # recipient -> exception raised when sending to it
+    failures = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        type(self).connections += 1
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            for recipient in message.to:
+                if recipient in self.failures:
+                    raise self.failures[recipient]
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='api.tests.StandInSMTPBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_DELAY=60,
+)
+class EmailOutboxTests(TestCase):
+    """The email views queue into the outbox and send_outbox delivers it"""
+
+    def setUp(self):
+        StandInSMTPBackend.connections = 0
+        StandInSMTPBackend.failures = {}
+        self.user = User.objects.create(username='outbox')
+        self.member = FamilyMember.objects.create(
+            user=self.user, name='Parent', relation='Self', email='parent@example.com', can_view_all=True
+        )
+        FamilyMember.objects.create(user=self.user, name='Child', relation='Child', email='child@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queue_welcome(self, *recipients):
+        for recipient in recipients:
+            response = self.client.post('/api/email/welcome/', {'recipient_email': recipient, 'recipient_name': 'Test'})
+            self.assertEqual(response.status_code, 202)
+
+    def send_outbox(self, batch_size=100):
+        call_command('send_outbox', '--once', f'--batch-size={batch_size}', stdout=mock.MagicMock())
+
+    def test_views_queue_without_sending(self):
+        response = self.client.post('/api/email/monthly-summary/', {'family_member_id': self.member.id})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            sorted(result['to_email'] for result in response.data['results']), ['child@example.com', 'parent@example.com']
+        )
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(StandInSMTPBackend.connections, 0)
+
+        email_id = response.data['results'][0]['id']
+        self.assertEqual(self.client.get(f'/api/email/outbox/{email_id}/').data['status'], 'pending')
+
+    def test_batches_share_one_connection(self):
+        self.queue_welcome(*[f'user{index}@example.com' for index in range(5)])
+        self.send_outbox(batch_size=2)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(StandInSMTPBackend.connections, 1)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+
+    def test_retries_with_backoff_until_failed(self):
+        StandInSMTPBackend.failures = {'down@example.com': smtplib.SMTPServerDisconnected('Connection lost')}
+        self.queue_welcome('down@example.com', 'up@example.com')
+
+        self.send_outbox()
+        email = OutboundEmail.objects.get(to_email='down@example.com')
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertAlmostEqual(
+            (email.next_attempt_at - timezone.now()).total_seconds(), 60, delta=5
+        )
+        self.assertEqual(OutboundEmail.objects.get(to_email='up@example.com').status, 'sent')
+
+        # Not due yet
+        self.send_outbox()
+        self.assertEqual(OutboundEmail.objects.get(id=email.id).attempts, 1)
+
+        delays = []
+        for _ in range(2):
+            email = OutboundEmail.objects.get(id=email.id)
+            OutboundEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+            self.send_outbox()
+            email = OutboundEmail.objects.get(id=email.id)
+            delays.append(round((email.next_attempt_at - timezone.now()).total_seconds() / 60))
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
+        self.assertEqual(delays[0], 2)
+        self.assertIn('Connection lost', email.last_error)
+
+    def test_refused_recipient_fails_at_once(self):
+        StandInSMTPBackend.failures = {
+            'nobody@example.com': smtplib.SMTPRecipientsRefused({'nobody@example.com': (550, b'No such user')})
+        }
+        self.queue_welcome('nobody@example.com')
+        self.send_outbox()
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('failed', 1))
+
+
+class LedgerSearchTests(TestCase):
+    """ledger/search/ finds rows through the search index kept by migration 0017"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='search')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        return [row['key'] for row in self.client.get('/api/ledger/search/', {'q': query}).data['results']]
+
+    def test_index_follows_writes(self):
+        expense = Expense.objects.create(family_member=self.member, description='Office printer', amount=Decimal('99'))
+        mile = Mile.objects.create(family_member=self.member, description='Drive to the office', miles=Decimal('12'))
+        Hour.objects.create(family_member=self.member, description='Garden work', hours=Decimal('3'))
+        self.assertEqual(sorted(self.search('office')), [f'expense-{expense.id}', f'mile-{mile.id}'])
+
+        expense.description = 'Paper towels'
+        expense.save()
+        self.assertEqual(self.search('office'), [f'mile-{mile.id}'])
+
+        mile.delete()
+        self.assertEqual(self.search('office'), [])
+        self.assertEqual(self.search('towel'), [f'expense-{expense.id}'])
+
+    def test_ranking_and_pages(self):
+        longer = Expense.objects.create(
+            family_member=self.member, description='Printer ink refill for the upstairs office printer', amount=Decimal('30')
+        )
+        best = Expense.objects.create(family_member=self.member, description='Printer ink', amount=Decimal('20'))
+        results = self.client.get('/api/ledger/search/', {'q': 'printer ink'}).data['results']
+        self.assertEqual([row['key'] for row in results], [f'expense-{best.id}', f'expense-{longer.id}'])
+        self.assertGreaterEqual(results[0]['rank'], results[1]['rank'])
+
+        receipts = Expense.objects.bulk_create([
+            Expense(family_member=self.member, description=f'Receipt {index}', amount=Decimal('1')) for index in range(25)
+        ])
+        keys = []
+        page = self.client.get('/api/ledger/search/', {'q': 'receipt', 'page_size': 10}).data
+        self.assertEqual(page['count'], 25)
+        while True:
+            keys += [row['key'] for row in page['results']]
+            if not page['next']:
+                break
+            page = self.client.get(page['next']).data
+        self.assertEqual(sorted(keys), sorted(f'expense-{receipt.id}' for receipt in receipts))
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigram search runs on PostgreSQL')
+    def test_fuzzy_match_on_postgresql(self):
+        expense = Expense.objects.create(family_member=self.member, description='Printer cartridge', amount=Decimal('30'))
+        self.assertEqual(self.search('printr'), [f'expense-{expense.id}'])
+
+
+class LedgerSearchRebuildTests(TransactionTestCase):
+    """The SQLite search triggers survive migrations that rebuild a ledger table"""
+
+    def tearDown(self):
+        # Not a model table, so the flush leaves it alone
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM api_ledger_search')
+
+    def alter_description(self, max_length):
+        old_field = Expense._meta.get_field('description')
+        new_field = models.CharField(max_length=max_length)
+        new_field.set_attributes_from_name('description')
+        new_field.model = Expense
+        # As a migration does: drop the ledger view, rebuild the table (SQLite copies it into a new one,
+        # without its triggers) and recreate the view
+        ledger_view = import_module('api.migrations.0012_ledgerentry')
+        with connection.schema_editor() as editor:
+            editor.execute(ledger_view.DROP_LEDGER_VIEW)
+            editor.alter_field(Expense, old_field, new_field)
+            editor.execute(ledger_view.CREATE_LEDGER_VIEW)
+
+    @skipUnless(connection.vendor == 'sqlite', 'only SQLite keeps the index with triggers')
+    def test_triggers_survive_table_rebuild(self):
+        user = User.objects.create(username='rebuild')
+        member = FamilyMember.objects.create(user=user, name='Parent', relation='Self', can_view_all=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        before = Expense.objects.create(family_member=member, description='Office printer', amount=Decimal('99'))
+
+        self.alter_description(250)
+        try:
+            during = Expense.objects.create(family_member=member, description='Office chair', amount=Decimal('80'))
+            emit_post_migrate_signal(0, False, connection.alias)
+            after = Expense.objects.create(family_member=member, description='Office desk', amount=Decimal('150'))
+            keys = [row['key'] for row in client.get('/api/ledger/search/', {'q': 'office'}).data['results']]
+            self.assertEqual(sorted(keys), sorted(f'expense-{entry.id}' for entry in (before, during, after)))
+        finally:
+            self.alter_description(200)
+            emit_post_migrate_signal(0, False, connection.alias)
+
+
+class ResponseCacheTests(TestCase):
+    """Read endpoints answered from the per-family response cache (api/response_cache.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='cached')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def member_data(self):
+        return self.client.get(f'/api/family/member/{self.member.id}/')
+
+    def test_writes_outside_the_api_invalidate(self):
+        self.assertEqual(self.member_data().data['expenses'], [])
+        with self.assertNumQueries(1):
+            # The data version lookup, the response comes from the cache
+            self.assertEqual(self.member_data().data['expenses'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(family_member=self.member, description='Printer', amount=Decimal('99'))
+        self.assertEqual(len(self.member_data().data['expenses']), 1)
+
+        self.assertEqual(self.cache_stats()['get_family_member_data'], {'hits': 1, 'misses': 2, 'hit_rate': 0.333})
+
+    def cache_stats(self):
+        # A real access token, so request.user comes from its claims as in production
+        User.objects.create_user('operator', password='pw123456', is_staff=True)
+        login = APIClient().post('/api/auth/login/', {'username': 'operator', 'password': 'pw123456'})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {login.data['tokens']['access']}")
+        response = client.get('/api/cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['views']
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+
+
+class MonthlySummaryTests(TestCase):
+    """send_monthly_summaries queues every family's summary in a fixed number of queries"""
+
+    def add_families(self, count):
+        for _ in range(count):
+            user = User.objects.create(username=f'summary-{User.objects.count()}')
+            member = FamilyMember.objects.create(
+                user=user, name='Parent', relation='Self', email=f'parent{user.id}@example.com', send_reports=True
+            )
+            with mock.patch('django.utils.timezone.now', return_value=datetime(2024, 5, 10, tzinfo=dt_timezone.utc)):
+                Expense.objects.create(family_member=member, description='Groceries', amount=Decimal('20'))
+
+    def send_summaries(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('send_monthly_summaries', '--month=2024-05', stdout=mock.MagicMock())
+        return len(queries)
+
+    def test_queries_do_not_grow_with_families(self):
+        self.add_families(2)
+        few = self.send_summaries()
+        self.add_families(8)
+        many = self.send_summaries()
+        self.assertEqual(few, many)
+        self.assertEqual(OutboundEmail.objects.filter(kind='month_end_2024-05').count(), 10)
+        # A re-run finds everything already queued
+        self.send_summaries()
+        self.assertEqual(OutboundEmail.objects.count(), 10)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """request.user built from access token claims (api/authentication.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='pw123456', is_staff=True)
+        FamilyMember.objects.create(user=self.user, name='Staff', relation='Self')
+        tokens = self.client.post('/api/auth/login/', {'username': 'staff', 'password': 'pw123456'}).json()['tokens']
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+
+    def request_user(self, access):
+        request = mock.Mock(META={'HTTP_AUTHORIZATION': f'Bearer {access}'})
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_staff_flags_and_read_only(self):
+        user = self.request_user(self.access)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.is_staff, user.is_superuser), (self.user.pk, True, False))
+        with self.assertRaises(ReadOnlyUserError):
+            user.save()
+        with self.assertRaises(ReadOnlyUserError):
+            user.delete()
+
+    def test_refresh_reads_current_flags(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        access = self.client.post(
+            '/api/auth/refresh/', {'refresh': self.refresh}, HTTP_AUTHORIZATION=f'Bearer {self.access}'
+        ).json()['access']
+        self.assertFalse(self.request_user(access).is_staff)
+
+
+class DeltaSyncTests(TestCase):
+    """sync/ reports rows written outside the API (admin, shell) too"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='syncing')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_outside_the_api(self):
+        expense = self.client.post(
+            '/api/expenses/', {'family_member': self.member.id, 'description': 'Printer', 'amount': '99'}
+        ).data
+        cursor = self.client.get('/api/sync/').data['cursor']
+
+        row = Expense.objects.get(pk=expense['id'])
+        row.description = 'Printer ink'
+        row.save()
+        mile = Mile.objects.create(family_member=self.member, description='Drive', miles=Decimal('5'))
+        changes = self.client.get('/api/sync/', {'since': cursor}).data
+        self.assertEqual([(item['id'], item['description']) for item in changes['expenses']], [(row.id, 'Printer ink')])
+        self.assertEqual([item['id'] for item in changes['miles']], [mile.id])
+
+        mile_id = mile.id
+        mile.delete()
+        changes = self.client.get('/api/sync/', {'since': changes['cursor']}).data
+        self.assertEqual(changes['deleted'], [{'kind': 'mile', 'id': mile_id}])
+        self.assertEqual(changes['miles'], [])
+
+
+class TaxCategorizationTests(TestCase):
+    """Expenses store the categorization of the configured rules (api/categorization.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='categories')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reference(self, description, amount):
+        # The first rule in file order with a keyword anywhere in the description
+        categorizer = get_categorizer()
+        for rule in categorizer.rules:
+            if any(keyword.lower() in description.lower() for keyword in rule['keywords']):
+                deductible = rule['tax_deductible'] and amount > rule.get('deductible_above', float('-inf'))
+                return rule['category'], deductible
+        return categorizer.default['category'], categorizer.default['tax_deductible']
+
+    def test_categorize_many_matches_categorize(self):
+        categorizer = get_categorizer()
+        descriptions = [
+            'Doctor visit', 'DOCTOR VISIT', 'School books', 'Church donation', 'Groceries', '',
+            # A later rule's keyword earlier in the text still loses to an earlier rule
+            'Rent for the home office', 'Pharmacy then office chair', 'Doctor visit',
+        ]
+        amounts = [120.0, 0.05, 30.0, 50.0, 80.0, 1.0, 900.0, 12.0, 0.01]
+        results = categorizer.categorize_many(descriptions, amounts)
+        self.assertEqual(results, [categorizer.categorize(d, a) for d, a in zip(descriptions, amounts)])
+        self.assertEqual(
+            [(result['category'], result['tax_deductible']) for result in results],
+            [self.reference(d, a) for d, a in zip(descriptions, amounts)]
+        )
+
+    def test_stored_on_create_and_update(self):
+        created = self.client.post(
+            '/api/expenses/', {'family_member': self.member.id, 'description': 'Doctor visit', 'amount': '120'}
+        ).data
+        expense = Expense.objects.get(id=created['id'])
+        self.assertEqual(
+            (expense.tax_category, expense.tax_deductible, expense.tax_confidence, expense.suggested_form),
+            tuple(get_categorizer().categorize('Doctor visit', 120.0).values())
+        )
+
+        self.client.patch(f"/api/expenses/{expense.id}/", {'description': 'School books'}, format='json')
+        expense.refresh_from_db()
+        self.assertEqual((expense.tax_category, expense.tax_deductible), ('Education Expense', True))
+        report = self.client.get('/api/tax-report/', {'year': timezone.now().year}).data
+        self.assertEqual(report['categories']['Education Expense']['total'], 120.0)
+
+
+class TaxReportCacheTests(TestCase):
+    """Cached tax reports follow every change to the family's expenses"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='taxes')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2023, 5, 1, tzinfo=dt_timezone.utc)):
+            self.client.post('/api/expenses/', {'family_member': self.member.id, 'description': 'Widget', 'amount': '50'})
+
+    def categories(self):
+        return list(self.client.get('/api/tax-report/', {'year': 2023}).data['categories'])
+
+    def test_recategorized_closed_year(self):
+        self.assertEqual(self.categories(), ['Personal Expense'])
+        rules = {
+            'rules': [{'category': 'Business Expense', 'keywords': ['widget'], 'tax_deductible': True,
+                       'confidence': 0.9, 'suggested_form': 'Schedule C'}],
+            'default': {'category': 'Personal Expense', 'tax_deductible': False, 'confidence': 0.5,
+                        'suggested_form': 'Not applicable'},
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as rules_file:
+            json.dump(rules, rules_file)
+            rules_file.flush()
+            with override_settings(TAX_RULES_FILE=rules_file.name):
+                call_command('categorize_expenses', stdout=mock.MagicMock())
+        reload_rules()
+        self.assertEqual(self.categories(), ['Business Expense'])
+
+    def test_only_the_written_year_is_dropped(self):
+        self.categories()
+        with self.assertNumQueries(0):
+            self.categories()
+        
+        # Miles and other years' expenses leave the closed year's report alone
+        self.client.post('/api/miles/', {'family_member': self.member.id, 'description': 'Drive', 'miles': '4'})
+        self.client.post('/api/expenses/', {'family_member': self.member.id, 'description': 'Desk', 'amount': '20'})
+        self.assertIsNotNone(cache.get(tax_report_cache_key(self.user.id, 2023)))
+        
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2023, 9, 1, tzinfo=dt_timezone.utc)):
+            Expense.objects.create(family_member=self.member, description='Doctor visit', amount=Decimal('80'))
+        self.assertIsNone(cache.get(tax_report_cache_key(self.user.id, 2023)))
+        self.assertEqual(sorted(self.categories()), ['Medical Expense', 'Personal Expense'])
+
+
+class ConditionalGetTests(TestCase):
+    """ETags of data versioned responses (api/versions.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='etags')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_per_representation(self):
+        response = self.client.get('/api/expenses/')
+        self.assertIn('Accept', response['Vary'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/expenses/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Another page layout or renderer of the same data version is a different representation
+        cursor_page = self.client.get('/api/expenses/', {'pagination': 'cursor'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cursor_page.status_code, 200)
+        browsable = self.client.get('/api/expenses/', HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='text/html')
+        self.assertEqual(browsable.status_code, 200)
+        self.assertNotEqual(browsable['ETag'], etag)
+
+
+class LedgerRollupTests(TestCase):
+    """Rollups kept by the API writes match a recount from the ledger tables"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='rollups')
+        self.parent = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.child = FamilyMember.objects.create(user=self.user, name='Child', relation='Child')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self):
+        # A recount also writes zero rows for members without entries
+        rollups = LedgerRollup.objects.filter(family_member__user=self.user).exclude(expense_count=0, mile_count=0)
+        monthly = LedgerMonthlyRollup.objects.filter(family_member__user=self.user, expense_count__gt=0)
+        return (
+            sorted(rollups.values_list('family_member_id', 'expense_total', 'expense_count', 'mile_total', 'mile_count')),
+            sorted(monthly.values_list('family_member_id', 'month', 'expense_total', 'expense_count')),
+        )
+
+    def assertMatchesRecount(self, expected_parent_total):
+        kept = self.totals()
+        self.assertEqual(LedgerRollup.objects.get(family_member=self.parent).expense_total, Decimal(expected_parent_total))
+        rebuild_rollups([self.parent.id, self.child.id])
+        self.assertEqual(kept, self.totals())
+
+    def test_create_update_move_delete(self):
+        expense = self.client.post(
+            '/api/expenses/', {'family_member': self.parent.id, 'description': 'Printer', 'amount': '100'}
+        ).data
+        self.client.post('/api/miles/', {'family_member': self.parent.id, 'description': 'Drive', 'miles': '12.5'})
+        self.assertMatchesRecount('100')
+
+        self.client.patch(f"/api/expenses/{expense['id']}/", {'amount': '80'}, format='json')
+        self.assertMatchesRecount('80')
+
+        self.client.patch(f"/api/expenses/{expense['id']}/", {'family_member': self.child.id}, format='json')
+        self.assertMatchesRecount('0')
+        self.assertEqual(LedgerRollup.objects.get(family_member=self.child).expense_total, Decimal('80'))
+
+        self.client.delete(f"/api/expenses/{expense['id']}/")
+        self.assertMatchesRecount('0')
+        self.assertEqual(LedgerRollup.objects.get(family_member=self.child).expense_count, 0)
+
+    def test_concurrent_first_write(self):
+        # Another request's first write creates the rollup after our UPDATE missed it, so our rebuild conflicts
+        LedgerRollup.objects.create(family_member=self.parent, expense_total=Decimal('5'), expense_count=1)
+        expense = Expense.objects.create(family_member=self.parent, description='Printer', amount=Decimal('30'))
+        update = QuerySet.update
+        missed = []
+
+        def update_before_commit(queryset, **kwargs):
+            if queryset.model is LedgerRollup and not missed:
+                missed.append(kwargs)
+                return 0
+            return update(queryset, **kwargs)
+
+        changes = LedgerChanges()
+        changes.add(expense)
+        with mock.patch.object(QuerySet, 'update', update_before_commit), \
+                mock.patch('api.ledger.rebuild_rollups', side_effect=IntegrityError('UNIQUE constraint failed')):
+            changes.apply()
+        rollup = LedgerRollup.objects.get(family_member=self.parent)
+        self.assertEqual((rollup.expense_total, rollup.expense_count), (Decimal('35'), 2))
+
+
+class LedgerBatchTests(TestCase):
+    """ledger/batch/ writes all of its operations, with their ledger side effects, or none of them"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='batches')
+        self.parent = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.expense = Expense.objects.create(family_member=self.parent, description='Printer', amount=Decimal('100'))
+        self.mile = Mile.objects.create(family_member=self.parent, description='Drive', miles=Decimal('10'))
+        rebuild_rollups([self.parent.id])
+
+    def version(self):
+        return FamilyDataVersion.objects.get(user=self.user).version
+
+    def state(self):
+        return (
+            sorted(Expense.objects.filter(family_member__user=self.user).values_list('id', 'amount')),
+            sorted(Mile.objects.filter(family_member__user=self.user).values_list('id', 'miles')),
+            list(LedgerRollup.objects.filter(family_member__user=self.user).values_list(
+                'expense_total', 'expense_count', 'mile_total', 'mile_count'
+            )),
+            self.version(),
+            Tombstone.objects.filter(user=self.user).count(),
+        )
+
+    def test_mixed_batch(self):
+        version = self.version()
+        response = self.client.post('/api/ledger/batch/', {'operations': [
+            {'op': 'create', 'kind': 'expense', 'data': {'family_member': self.parent.id, 'description': 'Ink', 'amount': '20'}},
+            {'op': 'update', 'kind': 'expense', 'id': self.expense.id, 'data': {'amount': '80'}},
+            {'op': 'delete', 'kind': 'mile', 'id': self.mile.id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'updated', 'deleted'])
+
+        rollup = LedgerRollup.objects.get(family_member=self.parent)
+        self.assertEqual(
+            (rollup.expense_total, rollup.expense_count, rollup.mile_total, rollup.mile_count),
+            (Decimal('100'), 2, Decimal('0'), 0)
+        )
+        kept = self.state()[2]
+        rebuild_rollups([self.parent.id])
+        self.assertEqual(kept, self.state()[2])
+        self.assertEqual(self.version(), version + 1)
+        tombstones = Tombstone.objects.filter(user=self.user)
+        self.assertEqual(list(tombstones.values_list('kind', 'object_id')), [('mile', self.mile.id)])
+
+    def test_invalid_operation_rolls_back_batch(self):
+        before = self.state()
+        response = self.client.post('/api/ledger/batch/', {'operations': [
+            {'op': 'create', 'kind': 'expense', 'data': {'family_member': self.parent.id, 'description': 'Ink', 'amount': '20'}},
+            {'op': 'update', 'kind': 'expense', 'id': self.expense.id, 'data': {'amount': 'lots'}},
+            {'op': 'delete', 'kind': 'mile', 'id': self.mile.id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error_count'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], ['skipped', 'error', 'skipped'])
+        self.assertEqual(self.state(), before)
+
+
+class AsyncViewTests(TestCase):
+    """The async views (api/async_views.py) answer like the sync views they stand in for"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='async')
+        FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = str(tokens_for_user(self.user).access_token)
+
+    def assertSameAnswer(self, method, path, view, data=None, **kwargs):
+        sync_response = getattr(self.client, method)(path, data, **kwargs)
+        request = getattr(AsyncRequestFactory(), method)(path, data, headers={'Authorization': f'Bearer {self.token}'}, **kwargs)
+        async_response = async_to_sync(view)(request)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        sync_data, async_data = sync_response.json(), json.loads(async_response.content)
+        # Outbox rows differ between the two requests
+        sync_data.pop('email', None)
+        async_data.pop('email', None)
+        self.assertEqual(async_data, sync_data)
+        return async_response
+
+    def test_csv_export_streams_under_asgi(self):
+        Expense.objects.create(family_member=self.user.family_members.get(), description='Printer', amount=Decimal('99'))
+        params = {'format': 'csv', 'year': timezone.now().year}
+        sync_response = self.client.get('/api/export/', params)
+
+        async def export_over_asgi():
+            response = await AsyncClient().get('/api/export/', params, headers={'Authorization': f'Bearer {self.token}'})
+            # An async iterator, which Django streams instead of buffering it whole
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+        content = b''.join(sync_response.streaming_content)
+        self.assertIn(b'Printer', content)
+        self.assertEqual(async_to_sync(export_over_asgi)(), content)
+
+    def test_errors(self):
+        self.assertSameAnswer('get', '/api/statistics/', async_views.statistics)
+        self.assertSameAnswer('get', '/api/statistics/', async_views.statistics, {'family_member_id': '999'})
+        self.assertSameAnswer('get', '/api/tax-report/', async_views.tax_report, {'year': 'last'})
+        self.assertSameAnswer('post', '/api/email/test/', async_views.test_email, '{}', content_type='application/json')
+        self.assertSameAnswer('post', '/api/email/monthly-summary/', async_views.send_monthly_summary, {'family_member_id': 'x'})
+
+    def test_form_and_multipart_bodies(self):
+        welcome = {'recipient_email': 'kid@example.com', 'recipient_name': 'Kid'}
+        response = self.assertSameAnswer('post', '/api/email/welcome/', async_views.send_welcome_email, welcome)
+        self.assertEqual(response.status_code, 202)
+        response = self.assertSameAnswer(
+            'post', '/api/email/welcome/', async_views.send_welcome_email,
+            'recipient_email=kid%40example.com&recipient_name=Kid', content_type='application/x-www-form-urlencoded'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertSameAnswer('post', '/api/email/welcome/', async_views.send_welcome_email, {'recipient_name': 'Kid'})
+        response = self.assertSameAnswer(
+            'post', '/api/email/welcome/', async_views.send_welcome_email, '{"recipient', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportCsvTests(TestCase):
+    """export/?format=csv streams the family's ledger rows of the year"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='csv-export')
+        self.parent = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.child = FamilyMember.objects.create(user=self.user, name='Child', relation='Child')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rows_match_the_ledger(self):
+        year = timezone.now().year
+        for member in (self.parent, self.child):
+            Expense.objects.create(family_member=member, description=f'{member.name} doctor visit', amount=Decimal('120.50'))
+            Mile.objects.create(family_member=member, description=f'{member.name} drive', miles=Decimal('14'))
+            Hour.objects.create(family_member=member, description=f'{member.name} volunteering', hours=Decimal('2.5'))
+        last_year = Expense.objects.create(family_member=self.parent, description='Last year', amount=Decimal('5'))
+        Expense.objects.filter(id=last_year.id).update(created_at=timezone.now().replace(year=year - 1))
+        other = FamilyMember.objects.create(user=User.objects.create(username='other'), name='Other', relation='Self')
+        Expense.objects.create(family_member=other, description='Other family', amount=Decimal('7'))
+
+        expected = sorted(
+            (
+                timezone.localtime(entry.created_at).strftime('%Y-%m-%d'), entry.family_member.name, label,
+                entry.description, str(float(quantity(entry)))
+            )
+            for model, label, quantity in (
+                (Expense, 'Expense', lambda entry: entry.amount),
+                (Mile, 'Mile', lambda entry: entry.miles),
+                (Hour, 'Hour', lambda entry: entry.hours),
+            )
+            for entry in model.objects.filter(family_member__user=self.user, created_at__year=year)
+        )
+        self.assertEqual(len(expected), 6)
+
+        response = self.client.get('/api/export/', {'format': 'csv', 'year': year})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, *rows = csv.reader(b''.join(response.streaming_content).decode().splitlines())
+        self.assertEqual(header, EXPORT_COLUMNS)
+        self.assertEqual(sorted(tuple(row[:5]) for row in rows), expected)
+        # Grouped by member, the order both formats share
+        self.assertEqual([row[1] for row in rows], ['Parent'] * 3 + ['Child'] * 3)
+        # Rows read a few at a time from the cursor come out the same
+        self.assertEqual(
+            [list(map(str, row[:5])) for row in iter_export_rows(self.user, year, chunk_size=2)],
+            [row[:5] for row in rows]
+        )
+
+
+class ExportJobTests(TestCase):
+    """Background export jobs (api/export_jobs.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='exports')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/export/jobs/', {'format': 'csv', 'year': timezone.now().year})
+
+    def test_create_poll_download_and_reuse(self):
+        member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self')
+        Expense.objects.create(family_member=member, description='Printer', amount=Decimal('99'))
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(EXPORT_WORKERS=0, EXPORT_CACHE_DIR=cache_dir):
+            created = self.create_job()
+            self.assertEqual(created.status_code, 202)
+            job = self.client.get(f"/api/export/jobs/{created.data['id']}/").data
+            self.assertEqual(job['status'], 'done')
+            download = self.client.get(job['download_url'])
+            self.assertIn(b'Printer', b''.join(download.streaming_content))
+
+            # Unchanged data: the cached artifact is reused without running a job
+            reused = self.create_job()
+            self.assertEqual((reused.status_code, reused.data['status']), (201, 'done'))
+
+            Expense.objects.create(family_member=member, description='Ink', amount=Decimal('20'))
+            self.assertEqual(self.create_job().status_code, 202)
+
+    def test_stale_jobs_fail_on_poll(self):
+        # The pool process died mid-export, or the web worker restarted before submitting the job
+        running = ExportJob.objects.create(
+            user=self.user, year=2023, status='running', started_at=timezone.now() - timedelta(hours=2)
+        )
+        pending = ExportJob.objects.create(user=self.user, year=2023)
+        fresh = self.client.get(f'/api/export/jobs/{pending.id}/').data
+        self.assertEqual(fresh['status'], 'pending')
+
+        ExportJob.objects.filter(id=pending.id).update(created_at=timezone.now() - timedelta(hours=2))
+        for job in (running, pending):
+            data = self.client.get(f'/api/export/jobs/{job.id}/').data
+            self.assertEqual((data['status'], data['error']), ('failed', 'Export job timed out, please start a new one'))
+        self.assertEqual(self.client.get(f'/api/export/jobs/{running.id}/download/').status_code, 409)
+
+
+class ImportTests(TestCase):
+    """import/ writes the sheet's rows with their ledger side effects"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='imports')
+        self.member = FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rows_keep_their_dates(self):
+        sheet = SimpleUploadedFile('history.csv', (
+            b'Date,Description,Amount,Type\n'
+            b'2021-03-15,Doctor visit,120,expense\n'
+            b'2021-03-20,Drive to clinic,14,mile\n'
+            b'2021-13-01,Bad date,5,expense\n'
+        ))
+        response = self.client.post('/api/import/', {'file': sheet, 'family_member_id': self.member.id})
+        self.assertEqual((response.status_code, response.data['error_count']), (200, 1))
+
+        expense = Expense.objects.get(family_member=self.member)
+        mile = Mile.objects.get(family_member=self.member)
+        for entry, day in ((expense, 15), (mile, 20)):
+            self.assertEqual(timezone.localtime(entry.created_at).date(), datetime(2021, 3, day).date())
+        monthly = LedgerMonthlyRollup.objects.get(family_member=self.member)
+        self.assertEqual(
+            (monthly.month, monthly.expense_total, monthly.mile_total), (datetime(2021, 3, 1).date(), Decimal('120'), Decimal('14'))
+        )
+        report = self.client.get('/api/tax-report/', {'year': 2021}).data
+        self.assertEqual(report['categories']['Medical Expense']['total'], 120.0)
+
+
+class FamilyDataV2Tests(TestCase):
+    """family/all-data/v2/ runs a fixed number of queries per page however large the family is"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='admin-family')
+        FamilyMember.objects.create(user=self.user, name='Parent', relation='Self', can_view_all=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_members(self, count):
+        for _ in range(count):
+            member = FamilyMember.objects.create(user=self.user, name=f'Child {FamilyMember.objects.count()}', relation='Child')
+            Expense.objects.create(family_member=member, description='Books', amount=Decimal('15'))
+            Mile.objects.create(family_member=member, description='School run', miles=Decimal('3'))
+            # Other families' rows are never read
+            other = User.objects.create(username=f'other-{User.objects.count()}')
+            other_member = FamilyMember.objects.create(user=other, name='Other', relation='Self')
+            Expense.objects.create(family_member=other_member, description='Books', amount=Decimal('15'))
+        # Rows written straight to the ORM skip the API's rollup upkeep
+        rebuild_rollups()
+
+    def test_query_count_is_fixed(self):
+        self.add_members(2)
+        # The family members joined to their rollups, and the data version
+        with self.assertNumQueries(2):
+            self.client.get('/api/family/all-data/v2/')
+        # The family members, the data version and the page
+        with self.assertNumQueries(3):
+            self.client.get('/api/family/all-data/v2/expenses/')
+
+        self.add_members(10)
+        with self.assertNumQueries(2):
+            totals = self.client.get('/api/family/all-data/v2/').data
+        with self.assertNumQueries(3):
+            page = self.client.get('/api/family/all-data/v2/expenses/', {'page_size': 5}).data
+        self.assertEqual(totals['combined_statistics']['total_expenses'], 180.0)
+        self.assertEqual(totals['combined_statistics']['family_member_count'], 13)
+        self.assertEqual(len(page['results']), 5)
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Authentication endpoints
@@ -24,12 +25,22 @@ urlpatterns = [
     path('hours/', views.HourListCreateView.as_view(), name='hour_list'),
     path('hours/<int:pk>/', views.HourDetailView.as_view(), name='hour_detail'),
     
+    # Combined ledger (expenses, miles and hours) endpoint
+    path('ledger/', views.LedgerEntryListView.as_view(), name='ledger_list'),
+    path('ledger/batch/', views.ledger_batch, name='ledger_batch'),
+    path('ledger/search/', views.LedgerSearchView.as_view(), name='ledger_search'),
+    
     # Statistics endpoint
     path('statistics/', views.statistics, name='statistics'),
+    path('cache/stats/', views.response_cache_statistics, name='response_cache_statistics'),
+    path('trends/', views.trends, name='trends'),
     
     # Export/Import endpoints
     path('export/', views.export_transactions, name='export_transactions'),
     path('import/', views.import_transactions, name='import_transactions'),
+    path('export/jobs/', views.create_export_job, name='create_export_job'),
+    path('export/jobs/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('export/jobs/<int:pk>/download/', views.download_export_job, name='download_export_job'),
     path('tax-report/', views.tax_report, name='tax_report'),
     
     # Email endpoints
@@ -37,9 +48,27 @@ urlpatterns = [
     path('email/welcome/', views.send_welcome_email, name='send_welcome_email'),
     path('email/monthly-summary/', views.send_monthly_summary, name='send_monthly_summary'),
     path('email/test/', views.test_email, name='test_email'),
+    path('email/outbox/<int:pk>/', views.email_status, name='email_status'),
     
     # Multi-user family system endpoints
     path('user/family-member/', views.get_user_family_member, name='get_user_family_member'),
     path('family/all-data/', views.get_all_family_data, name='get_all_family_data'),
+    path('family/all-data/v2/', views.get_all_family_data_v2, name='get_all_family_data_v2'),
+    path('family/all-data/v2/<str:kind>/', views.get_all_family_ledger, name='get_all_family_ledger'),
     path('family/member/<int:member_id>/', views.get_family_member_data, name='get_family_member_data'),
+    
+    # Delta sync endpoint
+    path('sync/', views.sync_changes, name='sync_changes'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Under ASGI the same paths are served by async views, which come first so they take precedence
+    urlpatterns = [
+        path('statistics/', async_views.statistics, name='statistics'),
+        path('tax-report/', async_views.tax_report, name='tax_report'),
+        path('email/send-report/', async_views.send_family_report, name='send_family_report'),
+        path('email/welcome/', async_views.send_welcome_email, name='send_welcome_email'),
+        path('email/monthly-summary/', async_views.send_monthly_summary, name='send_monthly_summary'),
+        path('email/test/', async_views.test_email, name='test_email'),
+        path('user/family-member/', async_views.get_user_family_member, name='get_user_family_member'),
+    ] + urlpatterns
@@ -0,0 +1,112 @@
+# Family data versions for Family Bookkeeping
+import asyncio
+import hashlib
+from functools import wraps
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from .models import FamilyDataVersion
+
+
+def bump_data_versions(user_ids):
+    """
+    Advance the data version of each given user's family.
+    
+    Returns {user_id: new version}. Inside a transaction the version rows
+    stay locked until commit, so concurrent writers of one family get
+    distinct, increasing versions.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    now = timezone.now()
+    versions = FamilyDataVersion.objects.filter(user_id__in=user_ids)
+    if versions.update(version=F('version') + 1, updated_at=now) < len(user_ids):
+        # First write for some families, create their rows and bump those too
+        existing = set(versions.values_list('user_id', flat=True))
+        missing = user_ids - existing
+        FamilyDataVersion.objects.bulk_create(
+            [FamilyDataVersion(user_id=user_id) for user_id in missing], ignore_conflicts=True
+        )
+        FamilyDataVersion.objects.filter(user_id__in=missing).update(version=F('version') + 1, updated_at=now)
+    return dict(versions.values_list('user_id', 'version'))
+
+
+def data_version_query(user):
+    return FamilyDataVersion.objects.filter(user_id=user.id).values_list('version', 'updated_at')
+
+
+def get_data_version(user):
+    """Return (version, updated_at) of the user's family data, (0, None) before any write"""
+    return data_version_query(user).first() or (0, None)
+
+
+async def aget_data_version(user):
+    """Async get_data_version()"""
+    return await data_version_query(user).afirst() or (0, None)
+
+
+def versioned_response(request, build_response):
+    """
+    Answer a GET from the family data version before doing any other work.
+    
+    Returns 304 Not Modified when the client's If-None-Match (or
+    If-Modified-Since) matches the current version, otherwise calls
+    build_response() and tags a successful response with ETag and
+    Last-Modified.
+    """
+    version, updated_at = get_data_version(request.user)
+    # Reused by @family_cached (api/response_cache.py) inside the view
+    request.family_data_version = version
+    validators = _validators(request, version, updated_at)
+    response = get_conditional_response(request, **validators)
+    if response is None:
+        response = build_response()
+    return _tag_response(response, **validators)
+
+
+async def aversioned_response(request, build_response):
+    """Async versioned_response(), awaiting build_response()"""
+    version, updated_at = await aget_data_version(request.user)
+    request.family_data_version = version
+    validators = _validators(request, version, updated_at)
+    response = get_conditional_response(request, **validators)
+    if response is None:
+        response = await build_response()
+    return _tag_response(response, **validators)
+
+
+def _validators(request, version, updated_at):
+    # The same version renders differently per media type (JSON, browsable API) and query (filters, pagination)
+    media_type = getattr(request, 'accepted_media_type', None) or 'application/json'
+    representation = hashlib.sha1(f"{media_type}?{request.META.get('QUERY_STRING', '')}".encode()).hexdigest()[:16]
+    return {
+        'etag': f'"{request.user.id}-{version}-{representation}"',
+        'last_modified': int(updated_at.timestamp()) if updated_at else None,
+    }
+
+
+def _tag_response(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    # Responses differ per user and media type, and clients must revalidate before reuse
+    patch_vary_headers(response, ['Accept', 'Authorization'])
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def data_versioned(view):
+    """Decorator applying versioned_response to a function-based API view"""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            return await aversioned_response(request, lambda: view(request, *args, **kwargs))
+        return async_wrapper
+    
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return versioned_response(request, lambda: view(request, *args, **kwargs))
+    return wrapper
@@ -1,12 +1,18 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
 try:
     import pandas as pd
@@ -17,15 +23,40 @@ except ImportError:
     pd = None
     openpyxl = None
 
-from io import BytesIO
-import json
+import os
 from datetime import datetime, timedelta
-from .models import FamilyMember, Expense, Mile, Hour
+from .models import FamilyMember, Expense, Mile, Hour, ExportJob, OutboundEmail, Tombstone
 from .serializers import (
     UserSerializer, FamilyMemberSerializer, ExpenseSerializer, 
-    MileSerializer, HourSerializer, UserRegistrationSerializer
+    MileSerializer, HourSerializer, LedgerEntrySerializer, LedgerSearchResultSerializer, UserRegistrationSerializer,
+    ExportJobSerializer, OutboundEmailSerializer
 )
+from .authentication import access_token_for, tokens_for_user
+from .batch import BATCH_MAX_OPERATIONS, apply_ledger_batch
 from .email_service import EmailService
+from .endpoints import (
+    family_report_email, family_report_expenses, family_report_member, monthly_summary_data, monthly_summary_emails,
+    queued_email_data, self_member_data, statistics_request, tax_report_year, test_email_address, test_email_data,
+    welcome_email
+)
+from .family import get_family
+from .ledger import (
+    LEDGER_KINDS, LedgerChanges, LedgerRange, family_ledger, member_rollup, range_statistics, rollup_statistics,
+    tracked_ledger_writes
+)
+from .outbox import enqueue_emails
+from .pagination import LedgerCursorPagination, LedgerEntryCursorPagination, LedgerSearchPagination
+from .reports import TREND_PERIODS, cached_tax_report, ledger_trend
+from .response_cache import family_cached, response_cache_stats
+from .search import search_ledger
+from .versions import data_versioned, get_data_version, versioned_response
+from .exports import (
+    EXPORT_BUILDERS, build_excel, cached_export, export_cache_path, export_data_version,
+    aiter_csv, aiter_export_rows, iter_csv, iter_export_rows
+)
+from .export_jobs import expire_stale_job, submit_export_job
+from .importer import REQUIRED_COLUMNS, import_dataframe
+from .renderers import CSVPassthroughRenderer, ExcelPassthroughRenderer
 
 
 @api_view(['POST'])
@@ -44,7 +75,7 @@ def register(request):
         )
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'tokens': {
@@ -67,7 +98,7 @@ def login(request):
     
     user = authenticate(username=username, password=password)
     if user:
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'tokens': {
@@ -86,8 +117,7 @@ def refresh_token(request):
         return Response({'error': 'Refresh token required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        refresh = RefreshToken(refresh_token)
-        new_access_token = str(refresh.access_token)
+        new_access_token = str(access_token_for(RefreshToken(refresh_token)))
         return Response({'access': new_access_token})
     except Exception as e:
         return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -97,7 +127,8 @@ def refresh_token(request):
 @permission_classes([IsAuthenticated])
 def user_profile(request):
     """Get current user profile"""
-    return Response(UserSerializer(request.user).data)
+    # request.user only carries the token claims, load the full profile
+    return Response(UserSerializer(User.objects.get(pk=request.user.pk)).data)
 
 
 class FamilyMemberListCreateView(generics.ListCreateAPIView):
@@ -134,30 +165,115 @@ class FamilyMemberDetailView(generics.RetrieveUpdateDestroyAPIView):
         return FamilyMember.objects.filter(user=self.request.user)
 
 
-class ExpenseListCreateView(generics.ListCreateAPIView):
+def ledger_range_from_request(request):
+    """The start/end/min/max filters of a list request, a 400 response when malformed"""
+    try:
+        return LedgerRange.from_params(request.query_params)
+    except ValueError as e:
+        raise ValidationError({'error': str(e)})
+
+
+class LedgerWriteMixin:
+    """Apply ledger side effects (rollups, versions) in the same transaction as each write"""
+    
+    def perform_create(self, serializer):
+        family_member = get_family(self.request).get_member(self.request.data.get('family_member'))
+        if family_member is None:
+            raise NotFound('Family member not found')
+        with transaction.atomic(), tracked_ledger_writes():
+            changes = LedgerChanges()
+            changes.add(serializer.save(family_member=family_member))
+            changes.apply()
+    
+    def perform_update(self, serializer):
+        with transaction.atomic(), tracked_ledger_writes():
+            changes = LedgerChanges()
+            serializer.instance = self.lock_row(serializer.instance)
+            changes.remove(serializer.instance)
+            changes.add(serializer.save())
+            changes.apply()
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic(), tracked_ledger_writes():
+            changes = LedgerChanges()
+            instance = self.lock_row(instance)
+            changes.remove(instance)
+            instance.delete()
+            changes.apply()
+    
+    def lock_row(self, instance):
+        """
+        Re-read the row locked for the rest of the transaction.
+        
+        The rollups subtract the values a write replaces, so they must be
+        the committed ones: a concurrent update or delete of the same row
+        waits here and then sees this write's result.
+        """
+        try:
+            return type(instance).objects.select_for_update().get(pk=instance.pk)
+        except type(instance).DoesNotExist:
+            raise NotFound('Not found.')
+
+
+class LedgerListPaginationMixin:
+    """
+    Page-number pagination by default, keyset pagination on request.
+    
+    With '?pagination=cursor' lists are paged on (created_at, id) through
+    opaque 'next'/'previous' links and an optional 'page_size' (capped at
+    LedgerCursorPagination.max_page_size), so every page costs the same
+    however deep it is and concurrent inserts do not shift rows between pages.
+    """
+    
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.request.query_params.get('pagination') == 'cursor':
+            self._paginator = LedgerCursorPagination()
+        return super().paginator
+
+
+class DataVersionedListMixin:
+    """Conditional GET on list views, answered from the family data version"""
+    
+    def list(self, request, *args, **kwargs):
+        return versioned_response(request, lambda: super(DataVersionedListMixin, self).list(request, *args, **kwargs))
+
+
+class LedgerFastReadMixin:
+    """
+    Serve list GETs from values() rows instead of model serializer instances.
+    
+    Rows carry the serializer's fields with the member name joined in SQL,
+    and are rendered as is (ORJSONRenderer writes Decimals as strings, like
+    DecimalField). Writes still go through the serializer.
+    """
+    
+    def list(self, request, *args, **kwargs):
+        fields = [field for field in self.get_serializer_class().Meta.fields if field != 'family_member_name']
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *fields, family_member_name=F('family_member__name')
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
+
+class ExpenseListCreateView(DataVersionedListMixin, LedgerListPaginationMixin, LedgerFastReadMixin, LedgerWriteMixin,
+                            generics.ListCreateAPIView):
     """List and create expenses"""
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        queryset = Expense.objects.filter(family_member__user=self.request.user).select_related('family_member')
         family_member_id = self.request.query_params.get('family_member_id')
         if family_member_id:
-            return Expense.objects.filter(
-                family_member__user=self.request.user,
-                family_member_id=family_member_id
-            )
-        return Expense.objects.filter(family_member__user=self.request.user)
-    
-    def perform_create(self, serializer):
-        family_member_id = self.request.data.get('family_member')
-        family_member = FamilyMember.objects.get(
-            id=family_member_id, 
-            user=self.request.user
-        )
-        serializer.save(family_member=family_member)
+            queryset = queryset.filter(family_member_id=family_member_id)
+        return ledger_range_from_request(self.request).filter(queryset, 'amount')
 
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseDetailView(LedgerWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete an expense"""
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
@@ -166,30 +282,21 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Expense.objects.filter(family_member__user=self.request.user)
 
 
-class MileListCreateView(generics.ListCreateAPIView):
+class MileListCreateView(DataVersionedListMixin, LedgerListPaginationMixin, LedgerFastReadMixin, LedgerWriteMixin,
+                         generics.ListCreateAPIView):
     """List and create miles"""
     serializer_class = MileSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        queryset = Mile.objects.filter(family_member__user=self.request.user).select_related('family_member')
         family_member_id = self.request.query_params.get('family_member_id')
         if family_member_id:
-            return Mile.objects.filter(
-                family_member__user=self.request.user,
-                family_member_id=family_member_id
-            )
-        return Mile.objects.filter(family_member__user=self.request.user)
-    
-    def perform_create(self, serializer):
-        family_member_id = self.request.data.get('family_member')
-        family_member = FamilyMember.objects.get(
-            id=family_member_id, 
-            user=self.request.user
-        )
-        serializer.save(family_member=family_member)
+            queryset = queryset.filter(family_member_id=family_member_id)
+        return ledger_range_from_request(self.request).filter(queryset, 'miles')
 
 
-class MileDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MileDetailView(LedgerWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a mile record"""
     serializer_class = MileSerializer
     permission_classes = [IsAuthenticated]
@@ -198,30 +305,21 @@ class MileDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Mile.objects.filter(family_member__user=self.request.user)
 
 
-class HourListCreateView(generics.ListCreateAPIView):
+class HourListCreateView(DataVersionedListMixin, LedgerListPaginationMixin, LedgerFastReadMixin, LedgerWriteMixin,
+                         generics.ListCreateAPIView):
     """List and create hours"""
     serializer_class = HourSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        queryset = Hour.objects.filter(family_member__user=self.request.user).select_related('family_member')
         family_member_id = self.request.query_params.get('family_member_id')
         if family_member_id:
-            return Hour.objects.filter(
-                family_member__user=self.request.user,
-                family_member_id=family_member_id
-            )
-        return Hour.objects.filter(family_member__user=self.request.user)
-    
-    def perform_create(self, serializer):
-        family_member_id = self.request.data.get('family_member')
-        family_member = FamilyMember.objects.get(
-            id=family_member_id, 
-            user=self.request.user
-        )
-        serializer.save(family_member=family_member)
+            queryset = queryset.filter(family_member_id=family_member_id)
+        return ledger_range_from_request(self.request).filter(queryset, 'hours')
 
 
-class HourDetailView(generics.RetrieveUpdateDestroyAPIView):
+class HourDetailView(LedgerWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete an hour record"""
     serializer_class = HourSerializer
     permission_classes = [IsAuthenticated]
@@ -230,202 +328,245 @@ class HourDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Hour.objects.filter(family_member__user=self.request.user)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def statistics(request):
-    """Get statistics for a family member"""
-    family_member_id = request.query_params.get('family_member_id')
-    
-    if not family_member_id:
-        return Response({'error': 'Family member ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+class LedgerEntryListView(DataVersionedListMixin, generics.ListAPIView):
+    """List expenses, miles and hours together, newest first"""
+    serializer_class = LedgerEntrySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LedgerEntryCursorPagination
     
-    try:
-        family_member = FamilyMember.objects.get(
-            id=family_member_id, 
-            user=request.user
-        )
-    except FamilyMember.DoesNotExist:
-        return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
+    def get_queryset(self):
+        member_ids = get_family(self.request).member_ids
+        family_member_id = self.request.query_params.get('family_member_id')
+        if family_member_id:
+            member_ids = [member_id for member_id in member_ids if str(member_id) == family_member_id]
+        
+        queryset = family_ledger(member_ids).select_related('family_member')
+        kind = self.request.query_params.get('kind')
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        return ledger_range_from_request(self.request).filter(queryset, 'quantity')
+
+
+class LedgerSearchView(DataVersionedListMixin, generics.ListAPIView):
+    """Search expense, mile and hour descriptions, best match first"""
+    serializer_class = LedgerSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LedgerSearchPagination
     
-    # Calculate totals
-    total_expenses = Expense.objects.filter(family_member=family_member).aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('q', '').strip():
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
     
-    total_miles = Mile.objects.filter(family_member=family_member).aggregate(
-        total=Sum('miles')
-    )['total'] or 0
+    def get_queryset(self):
+        member_ids = get_family(self.request).member_ids
+        family_member_id = self.request.query_params.get('family_member_id')
+        if family_member_id:
+            member_ids = [member_id for member_id in member_ids if str(member_id) == family_member_id]
+        
+        kind = self.request.query_params.get('kind')
+        return search_ledger(member_ids, self.request.query_params['q'], [kind] if kind else None)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ledger_batch(request):
+    """Create, update and delete expenses, miles and hours in one request"""
+    operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+    if not isinstance(operations, list) or not operations:
+        return Response({'error': 'A non-empty list of operations is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return Response(
+            {'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}, status=status.HTTP_400_BAD_REQUEST
+        )
     
-    total_hours = Hour.objects.filter(family_member=family_member).aggregate(
-        total=Sum('hours')
-    )['total'] or 0
+    results = apply_ledger_batch(get_family(request), operations)
+    error_count = sum(result['status'] == 'error' for result in results)
+    return Response(
+        {'results': results, 'error_count': error_count},
+        status=status.HTTP_400_BAD_REQUEST if error_count else status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@data_versioned
+@family_cached
+def statistics(request):
+    """Get statistics for a family member"""
+    family_member, ledger_range = statistics_request(request.query_params, get_family(request))
+    if ledger_range:
+        return Response(range_statistics(family_member, ledger_range))
     
+    # Totals come from the rollup kept current by every ledger write
+    return Response(rollup_statistics(member_rollup(family_member)))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_statistics(request):
+    """Hit and miss counts of the per-family response cache, by view"""
     return Response({
-        'total_expenses': float(total_expenses),
-        'total_miles': float(total_miles),
-        'total_hours': float(total_hours)
+        'backend': settings.CACHES['default']['BACKEND'],
+        'timeout': settings.RESPONSE_CACHE_TIMEOUT,
+        'views': response_cache_stats(),
     })
 
 
-# AI-Powered Tax Categorization
-def categorize_expense_for_tax(description, amount):
-    """AI-powered tax categorization for expenses"""
-    description_lower = description.lower()
-    
-    # Business/Work-related expenses
-    business_keywords = ['office', 'supplies', 'computer', 'software', 'internet', 'phone', 'travel', 'meeting', 'client', 'business']
-    if any(keyword in description_lower for keyword in business_keywords):
-        return {
-            'category': 'Business Expense',
-            'tax_deductible': True,
-            'confidence': 0.85,
-            'suggested_form': 'Schedule C'
-        }
-    
-    # Medical expenses
-    medical_keywords = ['doctor', 'hospital', 'medicine', 'pharmacy', 'medical', 'health', 'dental', 'vision', 'prescription']
-    if any(keyword in description_lower for keyword in medical_keywords):
-        return {
-            'category': 'Medical Expense',
-            'tax_deductible': amount > 0.075,  # 7.5% of AGI threshold
-            'confidence': 0.90,
-            'suggested_form': 'Schedule A'
-        }
-    
-    # Education expenses
-    education_keywords = ['school', 'tuition', 'education', 'college', 'university', 'books', 'student', 'learning']
-    if any(keyword in description_lower for keyword in education_keywords):
-        return {
-            'category': 'Education Expense',
-            'tax_deductible': True,
-            'confidence': 0.80,
-            'suggested_form': 'Form 8863'
-        }
-    
-    # Charitable contributions
-    charity_keywords = ['donation', 'charity', 'church', 'nonprofit', 'foundation', 'relief', 'help']
-    if any(keyword in description_lower for keyword in charity_keywords):
-        return {
-            'category': 'Charitable Contribution',
-            'tax_deductible': True,
-            'confidence': 0.85,
-            'suggested_form': 'Schedule A'
-        }
+# Range of a trend request without start, by period
+TREND_DEFAULT_DAYS = {
+    'day': 30,
+    'week': 7 * 26,
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@data_versioned
+def trends(request):
+    """Expense, mile and hour totals per family member, bucketed by day, week, month or year"""
+    period = request.query_params.get('period', 'month')
+    if period not in TREND_PERIODS:
+        return Response({'error': f"period must be one of {', '.join(TREND_PERIODS)}"}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Home office expenses
-    home_office_keywords = ['home office', 'office supplies', 'utilities', 'rent', 'mortgage']
-    if any(keyword in description_lower for keyword in home_office_keywords):
-        return {
-            'category': 'Home Office Expense',
-            'tax_deductible': True,
-            'confidence': 0.75,
-            'suggested_form': 'Form 8829'
-        }
+    try:
+        end = request.query_params.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+        start = request.query_params.get('start')
+        if start:
+            start = datetime.strptime(start, '%Y-%m-%d').date()
+        elif period in TREND_DEFAULT_DAYS:
+            start = end - timedelta(days=TREND_DEFAULT_DAYS[period] - 1)
+        else:
+            # Five calendar years
+            start = end.replace(year=end.year - 4, month=1, day=1)
+    except ValueError:
+        return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    all_kinds = [kind for kind, _ in LEDGER_KINDS.values()]
+    kinds = request.query_params.get('kind')
+    kinds = kinds.split(',') if kinds else all_kinds
+    if not set(kinds) <= set(all_kinds):
+        return Response({'error': f"kind must be one or more of {', '.join(all_kinds)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    family = get_family(request)
+    members = family.members
+    family_member_id = request.query_params.get('family_member_id')
+    if family_member_id:
+        family_member = family.get_member(family_member_id)
+        if family_member is None:
+            return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
+        members = [family_member]
     
-    # Default categorization
-    return {
-        'category': 'Personal Expense',
-        'tax_deductible': False,
-        'confidence': 0.50,
-        'suggested_form': 'Not applicable'
-    }
+    series = ledger_trend([member.id for member in members], period, start, end, kinds)
+    for item in series:
+        item['family_member_name'] = family.members_by_id[item['family_member_id']].name
+    return Response({'period': period, 'start': start, 'end': end, 'series': series})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, CSVPassthroughRenderer, ExcelPassthroughRenderer])
 def export_transactions(request):
     """Export all transactions to Excel/CSV"""
     format_type = request.query_params.get('format', 'excel')  # excel or csv
-    year = request.query_params.get('year', datetime.now().year)
-    
-    # Get all family members for the user
-    family_members = FamilyMember.objects.filter(user=request.user)
-    
-    # Prepare data for export
-    export_data = []
-    
-    for member in family_members:
-        # Get expenses
-        expenses = Expense.objects.filter(family_member=member, created_at__year=year)
-        for expense in expenses:
-            tax_info = categorize_expense_for_tax(expense.description, float(expense.amount))
-            export_data.append({
-                'Date': expense.created_at.strftime('%Y-%m-%d'),
-                'Family Member': member.name,
-                'Type': 'Expense',
-                'Description': expense.description,
-                'Amount': float(expense.amount),
-                'Tax Category': tax_info['category'],
-                'Tax Deductible': tax_info['tax_deductible'],
-                'Confidence': tax_info['confidence'],
-                'Suggested Form': tax_info['suggested_form']
-            })
-        
-        # Get miles
-        miles = Mile.objects.filter(family_member=member, created_at__year=year)
-        for mile in miles:
-            export_data.append({
-                'Date': mile.created_at.strftime('%Y-%m-%d'),
-                'Family Member': member.name,
-                'Type': 'Mile',
-                'Description': mile.description,
-                'Amount': float(mile.miles),
-                'Tax Category': 'Business Mileage',
-                'Tax Deductible': True,
-                'Confidence': 0.90,
-                'Suggested Form': 'Schedule C'
-            })
-        
-        # Get hours
-        hours = Hour.objects.filter(family_member=member, created_at__year=year)
-        for hour in hours:
-            export_data.append({
-                'Date': hour.created_at.strftime('%Y-%m-%d'),
-                'Family Member': member.name,
-                'Type': 'Hour',
-                'Description': hour.description,
-                'Amount': float(hour.hours),
-                'Tax Category': 'Work Hours',
-                'Tax Deductible': False,
-                'Confidence': 0.70,
-                'Suggested Form': 'Not applicable'
-            })
-    
-    # Create DataFrame
-    df = pd.DataFrame(export_data)
+    try:
+        ledger_range = LedgerRange.from_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    # A date range replaces the default of the current year
+    year = request.query_params.get('year', None if ledger_range.has_dates else datetime.now().year)
+    name = f'family_transactions_{year}' if year else f'family_transactions_{ledger_range.start or "beginning"}_to_{ledger_range.end or "today"}'
     
     if format_type == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="family_transactions_{year}.csv"'
-        df.to_csv(response, index=False)
-        return response
-    else:  # Excel
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="family_transactions_{year}.xlsx"'
-        
-        # Create Excel file
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Transactions', index=False)
-            
-            # Add tax summary sheet
-            tax_summary = df.groupby(['Tax Category', 'Tax Deductible']).agg({
-                'Amount': 'sum',
-                'Confidence': 'mean'
-            }).reset_index()
-            tax_summary.to_excel(writer, sheet_name='Tax Summary', index=False)
-            
-            # Add family member summary
-            member_summary = df.groupby('Family Member').agg({
-                'Amount': 'sum',
-                'Type': 'count'
-            }).reset_index()
-            member_summary.columns = ['Family Member', 'Total Amount', 'Transaction Count']
-            member_summary.to_excel(writer, sheet_name='Family Summary', index=False)
-        
-        output.seek(0)
-        response.write(output.getvalue())
+        # Stream rows straight from the database cursors to the client
+        if isinstance(request._request, ASGIRequest):
+            # ASGI buffers sync iterators whole, an async one streams
+            rows = aiter_csv(aiter_export_rows(request.user, year, ledger_range=ledger_range))
+        else:
+            rows = iter_csv(iter_export_rows(request.user, year, ledger_range=ledger_range))
+        response = StreamingHttpResponse(rows, content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
         return response
+    
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = f'attachment; filename="{name}.xlsx"'
+    if ledger_range:
+        response.write(build_excel(request.user, year, ledger_range))
+    else:
+        # Whole year, reusing the cached workbook when the year's data is unchanged
+        response.write(cached_export(request.user, year, 'excel').read_bytes())
+    return response
+
+
+def _export_job_data(request, job):
+    """Status payload for an export job"""
+    data = ExportJobSerializer(job).data
+    if job.status == 'done':
+        data['download_url'] = request.build_absolute_uri(reverse('download_export_job', args=[job.id]))
+    return data
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_export_job(request):
+    """Start a background export, or return a finished one if the year's data is unchanged"""
+    format_type = request.data.get('format', 'excel')
+    if format_type not in EXPORT_BUILDERS:
+        return Response({'error': f'Unsupported format: {format_type}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        year = int(request.data.get('year', datetime.now().year))
+    except (TypeError, ValueError):
+        return Response({'error': 'year must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data_version = export_data_version(request.user.id, year)
+    path = export_cache_path(request.user.id, year, format_type, data_version)
+    if path.exists():
+        job = ExportJob.objects.create(
+            user=request.user, year=year, format=format_type, status='done',
+            data_version=data_version, file_path=str(path), finished_at=timezone.now()
+        )
+        return Response(_export_job_data(request, job), status=status.HTTP_201_CREATED)
+    
+    job = ExportJob.objects.create(user=request.user, year=year, format=format_type)
+    submit_export_job(job)
+    return Response(_export_job_data(request, job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_status(request, pk):
+    """Poll the status of an export job"""
+    try:
+        job = ExportJob.objects.get(id=pk, user=request.user)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export job not found'}, status=status.HTTP_404_NOT_FOUND)
+    expire_stale_job(job)
+    return Response(_export_job_data(request, job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_export_job(request, pk):
+    """Download the artifact of a finished export job"""
+    try:
+        job = ExportJob.objects.get(id=pk, user=request.user)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export job not found'}, status=status.HTTP_404_NOT_FOUND)
+    expire_stale_job(job)
+    
+    if job.status != 'done':
+        return Response({'error': f'Export job is {job.status}'}, status=status.HTTP_409_CONFLICT)
+    if not os.path.exists(job.file_path):
+        return Response({'error': 'Export has expired, please start a new one'}, status=status.HTTP_410_GONE)
+    
+    extension = EXPORT_BUILDERS[job.format][1]
+    return FileResponse(
+        open(job.file_path, 'rb'), as_attachment=True,
+        filename=f'family_transactions_{job.year}.{extension}'
+    )
 
 
 @api_view(['POST'])
@@ -441,9 +582,8 @@ def import_transactions(request):
     if not family_member_id:
         return Response({'error': 'Family member ID is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        family_member = FamilyMember.objects.get(id=family_member_id, user=request.user)
-    except FamilyMember.DoesNotExist:
+    family_member = get_family(request).get_member(family_member_id)
+    if family_member is None:
         return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
     
     try:
@@ -454,56 +594,18 @@ def import_transactions(request):
             df = pd.read_excel(file)
         
         # Validate required columns
-        required_columns = ['Date', 'Description', 'Amount', 'Type']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         if missing_columns:
             return Response({
                 'error': f'Missing required columns: {", ".join(missing_columns)}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Parse date
-                if isinstance(row['Date'], str):
-                    date = datetime.strptime(row['Date'], '%Y-%m-%d')
-                else:
-                    date = row['Date']
-                
-                # Create transaction based on type
-                if row['Type'].lower() == 'expense':
-                    Expense.objects.create(
-                        family_member=family_member,
-                        description=row['Description'],
-                        amount=float(row['Amount']),
-                        created_at=date
-                    )
-                    imported_count += 1
-                elif row['Type'].lower() == 'mile':
-                    Mile.objects.create(
-                        family_member=family_member,
-                        description=row['Description'],
-                        miles=float(row['Amount']),
-                        created_at=date
-                    )
-                    imported_count += 1
-                elif row['Type'].lower() == 'hour':
-                    Hour.objects.create(
-                        family_member=family_member,
-                        description=row['Description'],
-                        hours=float(row['Amount']),
-                        created_at=date
-                    )
-                    imported_count += 1
-                    
-            except Exception as e:
-                errors.append(f'Row {index + 1}: {str(e)}')
+        imported_count, errors = import_dataframe(family_member, df)
         
         return Response({
             'message': f'Successfully imported {imported_count} transactions',
-            'errors': errors[:10]  # Limit to first 10 errors
+            'errors': errors[:10],  # Limit to first 10 errors
+            'error_count': len(errors)
         })
         
     except Exception as e:
@@ -514,65 +616,7 @@ def import_transactions(request):
 @permission_classes([IsAuthenticated])
 def tax_report(request):
     """Generate AI-powered tax report for the year"""
-    year = request.query_params.get('year', datetime.now().year)
-    
-    # Get all transactions for the year
-    family_members = FamilyMember.objects.filter(user=request.user)
-    
-    tax_data = {
-        'year': year,
-        'total_deductible': 0,
-        'categories': {},
-        'recommendations': [],
-        'forms_needed': set()
-    }
-    
-    for member in family_members:
-        expenses = Expense.objects.filter(family_member=member, created_at__year=year)
-        
-        for expense in expenses:
-            tax_info = categorize_expense_for_tax(expense.description, float(expense.amount))
-            
-            category = tax_info['category']
-            if category not in tax_data['categories']:
-                tax_data['categories'][category] = {
-                    'total': 0,
-                    'count': 0,
-                    'deductible': 0,
-                    'confidence': 0
-                }
-            
-            tax_data['categories'][category]['total'] += float(expense.amount)
-            tax_data['categories'][category]['count'] += 1
-            tax_data['categories'][category]['confidence'] += tax_info['confidence']
-            
-            if tax_info['tax_deductible']:
-                tax_data['categories'][category]['deductible'] += float(expense.amount)
-                tax_data['total_deductible'] += float(expense.amount)
-                tax_data['forms_needed'].add(tax_info['suggested_form'])
-    
-    # Calculate average confidence
-    for category in tax_data['categories']:
-        if tax_data['categories'][category]['count'] > 0:
-            tax_data['categories'][category]['confidence'] /= tax_data['categories'][category]['count']
-    
-    # Generate AI recommendations
-    if tax_data['total_deductible'] > 0:
-        tax_data['recommendations'].append(f"Total potential tax deductions: ${tax_data['total_deductible']:,.2f}")
-    
-    if 'Medical Expense' in tax_data['categories']:
-        medical_total = tax_data['categories']['Medical Expense']['deductible']
-        if medical_total > 0:
-            tax_data['recommendations'].append(f"Medical expenses: ${medical_total:,.2f} (may be deductible if > 7.5% of AGI)")
-    
-    if 'Business Expense' in tax_data['categories']:
-        business_total = tax_data['categories']['Business Expense']['deductible']
-        if business_total > 0:
-            tax_data['recommendations'].append(f"Business expenses: ${business_total:,.2f} (Schedule C required)")
-    
-    tax_data['forms_needed'] = list(tax_data['forms_needed'])
-    
-    return Response(tax_data)
+    return Response(cached_tax_report(request.user.id, tax_report_year(request.query_params)))
 
 
 # Email Endpoints
@@ -580,61 +624,13 @@ def tax_report(request):
 @permission_classes([IsAuthenticated])
 def send_family_report(request):
     """Send a report to a family member via email"""
+    family_member = family_report_member(request.data, get_family(request))
     try:
-        data = request.data
-        recipient_email = data.get('recipient_email')
-        recipient_name = data.get('recipient_name')
-        family_member_id = data.get('family_member_id')
-        report_type = data.get('report_type', 'monthly')
+        # Queue the email for the send_outbox worker
+        message = family_report_email(request.data, family_member, family_report_expenses(family_member))
+        emails = enqueue_emails([message], 'family_report', request.user)
         
-        if not all([recipient_email, recipient_name, family_member_id]):
-            return Response({
-                'error': 'recipient_email, recipient_name, and family_member_id are required'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get family member
-        try:
-            family_member = FamilyMember.objects.get(
-                id=family_member_id, 
-                user=request.user
-            )
-        except FamilyMember.DoesNotExist:
-            return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Get report data
-        expenses = Expense.objects.filter(family_member=family_member)
-        miles = Mile.objects.filter(family_member=family_member)
-        hours = Hour.objects.filter(family_member=family_member)
-        
-        # Calculate summary
-        total_expenses = expenses.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_miles = miles.aggregate(Sum('miles'))['miles__sum'] or 0
-        total_hours = hours.aggregate(Sum('hours'))['hours__sum'] or 0
-        
-        report_data = {
-            'summary': {
-                'totalExpenses': float(total_expenses),
-                'totalMiles': float(total_miles),
-                'totalHours': float(total_hours)
-            },
-            'expenses': [
-                {
-                    'description': exp.description,
-                    'amount': float(exp.amount),
-                    'created_at': exp.created_at.isoformat()
-                } for exp in expenses[:10]
-            ]
-        }
-        
-        # Send email
-        success, message = EmailService.send_family_report(
-            recipient_email, recipient_name, family_member.name, report_data, report_type
-        )
-        
-        if success:
-            return Response({'message': message}, status=status.HTTP_200_OK)
-        else:
-            return Response({'error': message}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(queued_email_data('Report queued for sending', emails[0]), status=status.HTTP_202_ACCEPTED)
             
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -644,23 +640,12 @@ def send_family_report(request):
 @permission_classes([IsAuthenticated])
 def send_welcome_email(request):
     """Send welcome email to a new family member"""
+    message = welcome_email(request.data)
     try:
-        data = request.data
-        recipient_email = data.get('recipient_email')
-        recipient_name = data.get('recipient_name')
+        # Queue welcome email
+        emails = enqueue_emails([message], 'welcome', request.user)
         
-        if not all([recipient_email, recipient_name]):
-            return Response({
-                'error': 'recipient_email and recipient_name are required'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Send welcome email
-        success, message = EmailService.send_welcome_email(recipient_email, recipient_name)
-        
-        if success:
-            return Response({'message': message}, status=status.HTTP_200_OK)
-        else:
-            return Response({'error': message}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(queued_email_data('Welcome email queued for sending', emails[0]), status=status.HTTP_202_ACCEPTED)
             
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -670,86 +655,40 @@ def send_welcome_email(request):
 @permission_classes([IsAuthenticated])
 def send_monthly_summary(request):
     """Send monthly summary to family members"""
+    recipients, messages = monthly_summary_emails(request.data, get_family(request))
     try:
-        data = request.data
-        family_member_id = data.get('family_member_id')
-        
-        if not family_member_id:
-            return Response({'error': 'family_member_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get family member
-        try:
-            family_member = FamilyMember.objects.get(
-                id=family_member_id, 
-                user=request.user
-            )
-        except FamilyMember.DoesNotExist:
-            return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Get family members with email addresses
-        family_members_with_email = FamilyMember.objects.filter(
-            user=request.user,
-            email__isnull=False
-        ).exclude(email='')
-        
-        if not family_members_with_email.exists():
-            return Response({'error': 'No family members with email addresses found'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calculate summary data
-        expenses = Expense.objects.filter(family_member=family_member)
-        miles = Mile.objects.filter(family_member=family_member)
-        hours = Hour.objects.filter(family_member=family_member)
-        
-        summary_data = {
-            'total_expenses': float(expenses.aggregate(Sum('amount'))['amount__sum'] or 0),
-            'total_miles': float(miles.aggregate(Sum('miles'))['miles__sum'] or 0),
-            'total_hours': float(hours.aggregate(Sum('hours'))['hours__sum'] or 0),
-            'total_deductions': float(expenses.aggregate(Sum('amount'))['amount__sum'] or 0) * 0.1  # 10% deduction estimate
-        }
+        # Queue one email per family member with an email address
+        emails = enqueue_emails(messages, 'monthly_summary', request.user)
         
-        # Send emails to all family members with email addresses
-        results = []
-        for member in family_members_with_email:
-            success, message = EmailService.send_monthly_summary(
-                member.email, member.name, family_member.name, summary_data
-            )
-            results.append({
-                'email': member.email,
-                'name': member.name,
-                'success': success,
-                'message': message
-            })
-        
-        return Response({
-            'message': 'Monthly summary emails processed',
-            'results': results
-        }, status=status.HTTP_200_OK)
+        return Response(monthly_summary_data(recipients, emails), status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def email_status(request, pk):
+    """Poll the delivery status of a queued email"""
+    try:
+        email = OutboundEmail.objects.get(id=pk, user=request.user)
+    except OutboundEmail.DoesNotExist:
+        return Response({'error': 'Email not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(OutboundEmailSerializer(email).data)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def test_email(request):
-    """Test email functionality"""
+    """Test email functionality (sent right away, to check the mail server settings)"""
+    test_email = test_email_address(request.data)
     try:
-        data = request.data
-        test_email = data.get('test_email')
-        
-        if not test_email:
-            return Response({'error': 'test_email is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
         # Send test email
         success, message = EmailService.send_welcome_email(test_email, "Test User")
-        
-        if success:
-            return Response({'message': f'Test email sent to {test_email}'}, status=status.HTTP_200_OK)
-        else:
-            return Response({'error': f'Failed to send test email: {message}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response(test_email_data(test_email, success, message))
 
 
 # Multi-User Family System Endpoints
@@ -757,80 +696,47 @@ def test_email(request):
 @permission_classes([IsAuthenticated])
 def get_user_family_member(request):
     """Get the current user's family member profile"""
-    try:
-        # Get the first family member for the user (or the one with 'Self' relation)
-        family_members = FamilyMember.objects.filter(user=request.user)
-        
-        if not family_members.exists():
-            return Response({'error': 'Family member profile not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Try to get the 'Self' relation first, otherwise get the first one
-        family_member = family_members.filter(relation='Self').first()
-        if not family_member:
-            family_member = family_members.first()
-        
-        serializer = FamilyMemberSerializer(family_member)
-        return Response(serializer.data)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # The 'Self' relation, otherwise the first family member
+    return Response(self_member_data(get_family(request)))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@data_versioned
+@family_cached
 def get_all_family_data(request):
     """Get all family data for admin users"""
     try:
-        # Check if user is admin - get the first family member with admin privileges
-        user_family_members = FamilyMember.objects.filter(user=request.user)
-        if not user_family_members.exists():
-            return Response({'error': 'Family member profile not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Find admin family member (preferably 'Self' relation)
-        user_family_member = user_family_members.filter(relation='Self').first()
-        if not user_family_member:
-            user_family_member = user_family_members.first()
-        
-        if not user_family_member.can_view_all:
-            return Response({'error': 'Access denied. Admin privileges required.'}, status=status.HTTP_403_FORBIDDEN)
-        
-        # Get all family members
-        all_family_members = FamilyMember.objects.filter(user=request.user)
+        # Check if user is admin, then use all family members with their rollups
+        all_family_members, error = _load_family_for_admin(request)
+        if error:
+            return error
         
         # Get all expenses, miles, and hours for all family members
         all_expenses = Expense.objects.filter(family_member__in=all_family_members)
         all_miles = Mile.objects.filter(family_member__in=all_family_members)
         all_hours = Hour.objects.filter(family_member__in=all_family_members)
         
-        # Calculate combined statistics
-        total_expenses = all_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_miles = all_miles.aggregate(Sum('miles'))['miles__sum'] or 0
-        total_hours = all_hours.aggregate(Sum('hours'))['hours__sum'] or 0
-        
         # Get individual statistics for each family member
         individual_stats = []
+        combined = {'total_expenses': 0, 'total_miles': 0, 'total_hours': 0}
         for member in all_family_members:
-            member_expenses = all_expenses.filter(family_member=member)
-            member_miles = all_miles.filter(family_member=member)
-            member_hours = all_hours.filter(family_member=member)
+            member_statistics = rollup_statistics(member_rollup(member))
+            for key in combined:
+                combined[key] += member_statistics[key]
             
             individual_stats.append({
                 'family_member': FamilyMemberSerializer(member).data,
-                'expenses': ExpenseSerializer(member_expenses, many=True).data,
-                'miles': MileSerializer(member_miles, many=True).data,
-                'hours': HourSerializer(member_hours, many=True).data,
-                'statistics': {
-                    'total_expenses': float(member_expenses.aggregate(Sum('amount'))['amount__sum'] or 0),
-                    'total_miles': float(member_miles.aggregate(Sum('miles'))['miles__sum'] or 0),
-                    'total_hours': float(member_hours.aggregate(Sum('hours'))['hours__sum'] or 0)
-                }
+                'expenses': ExpenseSerializer(all_expenses.filter(family_member=member), many=True).data,
+                'miles': MileSerializer(all_miles.filter(family_member=member), many=True).data,
+                'hours': HourSerializer(all_hours.filter(family_member=member), many=True).data,
+                'statistics': member_statistics
             })
         
         return Response({
             'combined_statistics': {
-                'total_expenses': float(total_expenses),
-                'total_miles': float(total_miles),
-                'total_hours': float(total_hours),
-                'family_member_count': all_family_members.count()
+                **combined,
+                'family_member_count': len(all_family_members)
             },
             'individual_data': individual_stats,
             'all_expenses': ExpenseSerializer(all_expenses, many=True).data,
@@ -844,22 +750,162 @@ def get_all_family_data(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Ledger rows exposed by the paginated admin dashboard, keyed by URL segment
+FAMILY_LEDGERS = {
+    'expenses': (Expense, ExpenseSerializer),
+    'miles': (Mile, MileSerializer),
+    'hours': (Hour, HourSerializer),
+}
+
+
+def _load_family_for_admin(request):
+    """
+    Return the user's family members (with their rollups) for admin views.
+    
+    Returns (members, None) when the user may view all family data,
+    otherwise (None, error_response).
+    """
+    family = get_family(request)
+    if not family.members:
+        return None, Response({'error': 'Family member profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not family.can_view_all:
+        return None, Response({'error': 'Access denied. Admin privileges required.'}, status=status.HTTP_403_FORBIDDEN)
+    return family.members, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@data_versioned
+def get_all_family_data_v2(request):
+    """
+    Get per-member and combined totals for admin users.
+    
+    Totals are read from the ledger rollups, so this runs a single query
+    (family members joined to their rollups) on top of authentication,
+    however many members and ledger rows the family has. Ledger rows are
+    not inlined; follow the URLs in 'ledgers' to page through them.
+    """
+    members, error = _load_family_for_admin(request)
+    if error:
+        return error
+    
+    individual_stats = []
+    combined = {'total_expenses': 0, 'total_miles': 0, 'total_hours': 0}
+    for member in members:
+        member_statistics = rollup_statistics(member_rollup(member))
+        for key in combined:
+            combined[key] += member_statistics[key]
+        individual_stats.append({
+            'family_member': FamilyMemberSerializer(member).data,
+            'statistics': member_statistics
+        })
+    
+    return Response({
+        'combined_statistics': {
+            **combined,
+            'family_member_count': len(members)
+        },
+        'individual_data': individual_stats,
+        'ledgers': {
+            kind: request.build_absolute_uri(reverse('get_all_family_ledger', args=[kind]))
+            for kind in FAMILY_LEDGERS
+        }
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@data_versioned
+def get_all_family_ledger(request, kind):
+    """
+    Page through a family's expenses, miles or hours for admin users.
+    
+    Rows are newest first behind cursor pagination ('cursor' and
+    'page_size' query parameters) and can be narrowed with
+    'family_member_id'. Each page costs two queries on top of
+    authentication: the family members and the page itself.
+    """
+    if kind not in FAMILY_LEDGERS:
+        return Response({'error': f'Unknown ledger: {kind}'}, status=status.HTTP_404_NOT_FOUND)
+    
+    members, error = _load_family_for_admin(request)
+    if error:
+        return error
+    
+    member_ids = [member.id for member in members]
+    family_member_id = request.query_params.get('family_member_id')
+    if family_member_id:
+        member_ids = [member_id for member_id in member_ids if str(member_id) == family_member_id]
+    
+    model, serializer_class = FAMILY_LEDGERS[kind]
+    queryset = model.objects.filter(family_member_id__in=member_ids).select_related('family_member')
+    
+    paginator = LedgerCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Return the family's rows created, updated or deleted since a sync cursor.
+    
+    Pass the 'cursor' of the previous response as 'since', or omit it for a
+    full sync. Family members, expenses, miles and hours come back in full,
+    deletions as tombstones in 'deleted'. Deleting a family member deletes
+    its ledger rows too, without a tombstone for each of them.
+    """
+    since = request.query_params.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({'error': 'Invalid since cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Read the cursor before the rows: a write committing in between is sent again next time, never missed
+    cursor, _ = get_data_version(request.user)
+    
+    def changed(queryset):
+        return queryset if since is None else queryset.filter(sync_version__gt=since)
+    
+    family = get_family(request)
+    members = family.members
+    member_ids = family.member_ids
+    data = {
+        'cursor': cursor,
+        'family_members': FamilyMemberSerializer(
+            [member for member in members if since is None or member.sync_version > since], many=True
+        ).data
+    }
+    for kind, (model, serializer_class) in FAMILY_LEDGERS.items():
+        queryset = changed(model.objects.filter(family_member_id__in=member_ids)).select_related('family_member')
+        data[kind] = serializer_class(queryset, many=True).data
+    
+    tombstones = Tombstone.objects.none() if since is None else changed(Tombstone.objects.filter(user=request.user))
+    data['deleted'] = [
+        {'kind': kind, 'id': object_id}
+        for kind, object_id in tombstones.order_by('sync_version').values_list('kind', 'object_id')
+    ]
+    return Response(data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@family_cached
 def get_family_member_data(request, member_id):
     """Get specific family member's data"""
     try:
         # Check if user can view this data
-        user_family_members = FamilyMember.objects.filter(user=request.user)
-        if not user_family_members.exists():
+        family = get_family(request)
+        user_family_member = family.self_member
+        if user_family_member is None:
             return Response({'error': 'Family member profile not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get the user's main family member (preferably 'Self' relation)
-        user_family_member = user_family_members.filter(relation='Self').first()
-        if not user_family_member:
-            user_family_member = user_family_members.first()
-        
-        target_member = FamilyMember.objects.get(id=member_id)
+        # Only members of the user's own family can be viewed
+        target_member = family.get_member(member_id)
+        if target_member is None:
+            return Response({'error': 'Family member not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Allow if user is admin or viewing their own data
         if not user_family_member.can_view_all and user_family_member.id != target_member.id:
@@ -875,11 +921,7 @@ def get_family_member_data(request, member_id):
             'expenses': ExpenseSerializer(expenses, many=True).data,
             'miles': MileSerializer(miles, many=True).data,
             'hours': HourSerializer(hours, many=True).data,
-            'statistics': {
-                'total_expenses': float(expenses.aggregate(Sum('amount'))['amount__sum'] or 0),
-                'total_miles': float(miles.aggregate(Sum('miles'))['miles__sum'] or 0),
-                'total_hours': float(hours.aggregate(Sum('hours'))['hours__sum'] or 0)
-            }
+            'statistics': rollup_statistics(member_rollup(target_member))
         })
         
     except FamilyMember.DoesNotExist:
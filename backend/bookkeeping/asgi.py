@@ -7,5 +7,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookkeeping.settings')
+# Route the I/O-bound endpoints to the async views (see ASYNC_VIEWS)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
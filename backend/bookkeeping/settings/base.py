@@ -91,17 +91,57 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background exports: worker processes (0 runs jobs in the request thread) and artifact cache.
+# Artifacts are family data, so they live outside MEDIA_ROOT and are only served by download_export_job.
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', str(BASE_DIR / 'private' / 'exports'))
+# Seconds a job may stay pending or running before a poll marks it failed (its worker died or restarted)
+EXPORT_JOB_TIMEOUT = int(os.environ.get('EXPORT_JOB_TIMEOUT', '1800'))
+
+# Keyword rules used to categorize expenses for tax purposes
+TAX_RULES_FILE = os.environ.get('TAX_RULES_FILE', str(BASE_DIR / 'api' / 'tax_rules.json'))
+
+# Seconds a tax report stays cached. Expense writes drop it in the shared cache; with locmem this bounds staleness.
+TAX_REPORT_CACHE_TIMEOUT = int(os.environ.get('TAX_REPORT_CACHE_TIMEOUT', '3600'))
+
+# Django cache backing the response cache (api/response_cache.py) and tax reports. CACHE_BACKEND is locmem
+# (per process), file (shared by the workers of one host) or redis (any Redis-compatible server, needs the
+# redis package); CACHE_LOCATION is the cache name, directory or redis:// URL.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'family-bookkeeping'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+    }
+}
+if CACHE_BACKEND != 'redis':
+    # Redis evicts by its own maxmemory policy
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))}
+
+# Seconds a family's read responses stay cached (0 turns the response cache off). Entries are keyed by the
+# family data version, so a write is never answered with stale data; the timeout only bounds memory.
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '3600'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -113,6 +153,26 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Build request.user from the access token claims instead of loading it (api/authentication.py)
+JWT_STATELESS_USER = os.environ.get('JWT_STATELESS_USER', 'True').lower() == 'true'
+
+# Seconds a process trusts its last check that a token's user is still active
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', '30'))
+
+# Serve the I/O-bound endpoints (statistics, tax report, email) with native async views (api/async_views.py).
+# bookkeeping/asgi.py turns this on; under WSGI the sync DRF views are used.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Threads per process the async views send email from, i.e. how many SMTP sends one ASGI worker keeps in flight
+ASYNC_EMAIL_THREADS = int(os.environ.get('ASYNC_EMAIL_THREADS', '32'))
+
+# Email outbox (api/outbox.py) drained by the send_outbox worker: emails per batch, tries per email,
+# seconds before the first retry (doubled for each further one) and seconds a claimed batch stays locked
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '100'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get('EMAIL_OUTBOX_RETRY_DELAY', '60'))
+EMAIL_OUTBOX_LEASE = int(os.environ.get('EMAIL_OUTBOX_LEASE', '300'))
+
 # Email Configuration
 try:
     from api.email_config import EMAIL_CONFIG
@@ -14,7 +14,13 @@ ALLOWED_HOSTS = [
     '127.0.0.1',
 ]
 
-# PostgreSQL for production
+# PostgreSQL connections are kept per worker thread for DB_CONN_MAX_AGE seconds (0 opens one per request) and
+# checked before reuse, so each gunicorn worker thread holds at most one (sizing in gunicorn.conf.py). Django 4.2
+# has no built-in pool; with DB_POOLER=pgbouncer, DB_HOST/DB_PORT point at a PgBouncer in transaction mode.
+# ASGI runs each request in its own thread context, where persistent connections would pile up, so it
+# defaults to 0 and relies on PgBouncer instead.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0' if ASYNC_VIEWS else '60'))
+DB_POOLER = os.environ.get('DB_POOLER', '')
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -23,6 +29,13 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        # Transaction pooling hands each transaction to any server connection, so cursors can't outlive one
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
 
@@ -58,6 +71,8 @@ STATIC_URL = '/static/'
 STATIC_ROOT = '/var/www/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/var/www/media/'
+# Not under MEDIA_ROOT, which nginx serves publicly
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', '/var/lib/family_bookkeeping/exports/')
 
 # Logging for production
 LOGGING = {
@@ -0,0 +1,23 @@
+# Gunicorn settings for Family Bookkeeping (picked up from the working directory, backend/)
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processes and threads per process. Under WSGI every worker thread keeps its own PostgreSQL connection
+# for DB_CONN_MAX_AGE seconds, so an instance holds up to workers * threads of them: keep that, summed over
+# instances and the email and export workers, below the server's max_connections (or PgBouncer's pool).
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+
+# Restart a worker (closing its connections) after this many requests, 0 never does
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    if server.cfg.worker_class_str in ('sync', 'gthread'):
+        server.log.info(
+            'Up to %d database connections (%d workers x %d threads)', workers * threads, workers, threads
+        )
@@ -107,6 +107,9 @@ export DJANGO_SETTINGS_MODULE=bookkeeping.settings
 # Run migrations
 python manage.py migrate
 
+# Re-apply the tax rules in case they changed (only rewrites changed rows)
+python manage.py categorize_expenses
+
 # Create superuser (if not exists)
 python manage.py shell << PYTHON
 from django.contrib.auth.models import User
@@ -123,6 +126,11 @@ python manage.py collectstatic --noinput
 # Create log directory
 mkdir -p /var/log/django
 chown -R www-data:www-data /var/log/django
+
+# Create the private export cache (EXPORT_CACHE_DIR), which nginx does not serve
+mkdir -p /var/lib/family_bookkeeping/exports
+chown -R www-data:www-data /var/lib/family_bookkeeping
+chmod 750 /var/lib/family_bookkeeping
 EOF
 print_status "Application configured"
 